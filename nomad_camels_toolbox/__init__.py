@@ -1,10 +1,25 @@
-from .data_reader import read_camels_file
+from .data_reader import read_camels_file, read_fit_index
+from .utils.fit_variable_renaming import FitIndex
+from .column_stats import compute_column_stats, read_column_stats
 
 try:
-    from .plotting import recreate_plots
+    from .plotting import recreate_plots, recreate_plots_many
 except ImportError:
     pass
 
+try:
+    from .figure_export import write_compact_figure, read_compact_figure
+except ImportError:
+    pass
+
+try:
+    from .spectral_map import fit_spectral_map
+except ImportError:
+    pass
+
+from .intensity_map import integrated_intensity_map
+from .map_export import export_intensity_maps
+
 try:
     from .qt_viewer import run_viewer
 except ImportError:
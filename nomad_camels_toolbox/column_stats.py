@@ -0,0 +1,255 @@
+"""
+Summary statistics of the columns of CAMELS files, stored in a sidecar file.
+
+`compute_column_stats` reads every numeric column once, in chunks, and writes
+its minimum, maximum, mean, standard deviation, NaN count, monotonicity, a
+coarse histogram and, for columns with few values, the unique values into
+`<file name>.stats.h5` next to the file. `LazyDataSet` reads them with
+`read_column_stats`, so ranges of columns are known without reading them.
+The statistics are only used while the file has the modification time and
+size it had when they were computed.
+"""
+
+import os
+
+import h5py
+import numpy as np
+
+
+def stats_path(file_path):
+    """The path of the sidecar file with the statistics of a CAMELS file.
+
+    Parameters
+    ----------
+    file_path : str
+        Path to the CAMELS file.
+
+    Returns
+    -------
+    str
+        The path, `<file name>.stats.h5` in the directory of the file.
+    """
+    return f"{os.path.splitext(file_path)[0]}.stats.h5"
+
+
+def compute_column_stats(
+    file_path, out_path=None, bins=32, max_values=100, chunk_bytes=64 * 1024**2
+):
+    """Compute the statistics of all numeric columns of a CAMELS file.
+
+    All entries and data sets of the file are covered. Each column is read
+    once, in chunks of rows, so files larger than the memory can be handled.
+
+    Parameters
+    ----------
+    file_path : str
+        Path to the CAMELS file.
+    out_path : str, optional
+        Path of the file to write, `stats_path(file_path)` if not provided.
+    bins : int, optional
+        Number of bins of the histograms. Default is 32.
+    max_values : int, optional
+        The unique values of columns with at most this many values are
+        stored, e.g. for the value filters of the viewer. Default is 100.
+    chunk_bytes : int, optional
+        Approximate size of the chunks that are read. Default is 64 MB.
+
+    Returns
+    -------
+    str
+        The path of the written file.
+    """
+    if out_path is None:
+        out_path = stats_path(file_path)
+    stat = os.stat(file_path)
+    with h5py.File(file_path, "r") as f, h5py.File(out_path, "w") as out:
+        out.attrs["source_mtime_ns"] = stat.st_mtime_ns
+        out.attrs["source_size"] = stat.st_size
+        for entry in f:
+            if not isinstance(f[entry], h5py.Group) or "data" not in f[entry]:
+                continue
+            for group in _data_set_groups(f[entry]["data"]):
+                for key, dataset in _data_set_columns(group):
+                    if dataset.dtype.kind not in "iuf" or not dataset.shape:
+                        continue
+                    stats = _column_stats(dataset, bins, max_values, chunk_bytes)
+                    column = out.require_group(group.name).create_group(key)
+                    for name in (
+                        "count",
+                        "nan_count",
+                        "min",
+                        "max",
+                        "mean",
+                        "std",
+                        "monotonic",
+                    ):
+                        column.attrs[name] = stats[name]
+                    column["hist_counts"] = stats["hist_counts"]
+                    column["hist_edges"] = stats["hist_edges"]
+                    if stats["values"] is not None:
+                        column["values"] = stats["values"]
+    return out_path
+
+
+def read_column_stats(file_path, group_path):
+    """Read the statistics of the columns of a data set from the sidecar file.
+
+    Parameters
+    ----------
+    file_path : str
+        Path to the CAMELS file.
+    group_path : str
+        Path of the data set group in the file, e.g. "/CAMELS_entry/data".
+
+    Returns
+    -------
+    dict
+        The statistics keyed by the name of the column, each a dictionary of
+        "count", "nan_count", "min", "max", "mean", "std", "monotonic"
+        ("increasing", "decreasing", "constant", "none" or "" for columns
+        with more than one dimension), "hist_counts", "hist_edges" and
+        "values" (the sorted unique values or None if there are more than
+        `max_values`). Empty if there is no sidecar file or the file changed
+        since it was written.
+    """
+    path = stats_path(file_path)
+    if not os.path.isfile(path):
+        return {}
+    stat = os.stat(file_path)
+    try:
+        with h5py.File(path, "r") as f:
+            if (
+                f.attrs.get("source_mtime_ns") != stat.st_mtime_ns
+                or f.attrs.get("source_size") != stat.st_size
+                or group_path not in f
+            ):
+                return {}
+            stats = {}
+            for key, column in f[group_path].items():
+                if "count" not in column.attrs:
+                    # A nested data set, not a column.
+                    continue
+                stats[key] = dict(column.attrs)
+                stats[key]["monotonic"] = str(stats[key]["monotonic"])
+                stats[key]["hist_counts"] = column["hist_counts"][()]
+                stats[key]["hist_edges"] = column["hist_edges"][()]
+                stats[key]["values"] = (
+                    column["values"][()] if "values" in column else None
+                )
+            return stats
+    except OSError:
+        return {}
+
+
+def _data_set_groups(data_group):
+    """Yield the primary data set group and the groups of the other data sets."""
+    yield data_group
+    for key, item in data_group.items():
+        if (
+            isinstance(item, h5py.Group)
+            and key != "fits"
+            and not key.endswith("_variable_signal")
+        ):
+            yield item
+
+
+def _data_set_columns(data_set):
+    """Yield (name, h5py.Dataset) of the data and variables of a data set,
+    named as by `read_camels_file`."""
+    for key, item in data_set.items():
+        if isinstance(item, h5py.Group) and key.endswith("_variable_signal"):
+            for sub_key, sub_item in item.items():
+                if isinstance(sub_item, h5py.Dataset):
+                    yield sub_key, sub_item
+        elif isinstance(item, h5py.Dataset):
+            yield key, item
+
+
+def _column_stats(dataset, bins, max_values, chunk_bytes):
+    """Statistics of one column, computed in a single pass over chunks of rows.
+
+    Mean and variance of the chunks are combined with the parallel algorithm
+    of Chan et al. The histogram is approximate: each chunk is binned in its
+    own range, the bin centers are binned again into the final range.
+    """
+    row_bytes = max(dataset.dtype.itemsize * int(np.prod(dataset.shape[1:])), 1)
+    chunk_rows = max(chunk_bytes // row_bytes, 1)
+    count = 0
+    nan_count = 0
+    mean = 0.0
+    m2 = 0.0
+    lo = np.inf
+    hi = -np.inf
+    increasing = decreasing = dataset.ndim == 1
+    last = None
+    values = set()
+    centers = []
+    weights = []
+    for start in range(0, dataset.shape[0], chunk_rows):
+        chunk = np.asarray(dataset[start : start + chunk_rows], dtype=float)
+        nan_count += int(np.count_nonzero(np.isnan(chunk)))
+        finite = chunk[np.isfinite(chunk)]
+        if not finite.size:
+            continue
+        n = finite.size
+        chunk_mean = finite.mean()
+        chunk_m2 = ((finite - chunk_mean) ** 2).sum()
+        delta = chunk_mean - mean
+        total = count + n
+        mean += delta * n / total
+        m2 += chunk_m2 + delta**2 * count * n / total
+        count = total
+        chunk_lo = finite.min()
+        chunk_hi = finite.max()
+        lo = min(lo, chunk_lo)
+        hi = max(hi, chunk_hi)
+        if increasing or decreasing:
+            steps = np.diff(finite if last is None else np.append(last, finite))
+            increasing = increasing and bool(np.all(steps >= 0))
+            decreasing = decreasing and bool(np.all(steps <= 0))
+            last = finite[-1]
+        if values is not None:
+            values.update(np.unique(finite).tolist())
+            if len(values) > max_values:
+                values = None
+        counts, edges = np.histogram(finite, bins=bins, range=(chunk_lo, chunk_hi))
+        centers.append((edges[:-1] + edges[1:]) / 2)
+        weights.append(counts)
+    if count:
+        hist_counts, hist_edges = np.histogram(
+            np.concatenate(centers),
+            bins=bins,
+            range=(lo, hi),
+            weights=np.concatenate(weights),
+        )
+        hist_counts = hist_counts.astype(np.int64)
+    else:
+        lo = hi = mean = np.nan
+        hist_counts = np.zeros(bins, dtype=np.int64)
+        hist_edges = np.full(bins + 1, np.nan)
+    if dataset.ndim != 1:
+        monotonic = ""
+    elif increasing and decreasing:
+        monotonic = "constant"
+    elif increasing:
+        monotonic = "increasing"
+    elif decreasing:
+        monotonic = "decreasing"
+    else:
+        monotonic = "none"
+    return {
+        "count": count,
+        "nan_count": nan_count,
+        "min": float(lo),
+        "max": float(hi),
+        "mean": float(mean),
+        "std": float(np.sqrt(m2 / count)) if count else np.nan,
+        "monotonic": monotonic,
+        "hist_counts": hist_counts,
+        "hist_edges": hist_edges,
+        "values": (
+            None
+            if values is None or not count
+            else np.array(sorted(values), dtype=dataset.dtype)
+        ),
+    }
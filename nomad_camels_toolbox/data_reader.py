@@ -1,6 +1,19 @@
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+
 import h5py
 import numpy as np
 
+try:
+    from .column_stats import read_column_stats
+    from .utils.fit_variable_renaming import FitIndex
+except ImportError:
+    # The viewer is also started from within this directory.
+    from column_stats import read_column_stats
+    from utils.fit_variable_renaming import FitIndex
+
 try:
     import pandas as pd
 
@@ -8,6 +21,13 @@ try:
 except ImportError:
     PANDAS_INSTALLED = False
 
+try:
+    import polars as pl
+
+    POLARS_INSTALLED = True
+except ImportError:
+    POLARS_INSTALLED = False
+
 
 def read_camels_file(
     file_path,
@@ -17,6 +37,8 @@ def read_camels_file(
     read_variables: bool = True,
     return_fits: bool = False,
     read_all_datasets: bool = False,
+    lazy: bool = False,
+    backend: str = "pandas",
 ):
     """
     Read data from a CAMELS file.
@@ -37,14 +59,24 @@ def read_camels_file(
         Whether to return the fits of the data set.
     read_all_datasets : bool, optional (default: False)
         Whether to read all datasets in the file. If True, the data_set_key parameter is ignored. If True, a dictionary with the data sets is returned.
+    lazy : bool, optional (default: False)
+        If True, only the names, shapes and dtypes of the data are read. The data is returned as a `LazyDataSet` which reads the arrays from the file when they are accessed. return_dataframe is ignored in this case. Statistics of the columns computed by `column_stats.compute_column_stats` are available in its `stats`.
+    backend : str, optional (default: "pandas")
+        The library of the returned DataFrame. With "polars", a polars DataFrame is returned and return_dataframe is ignored. The arrays are used without copying where possible, data with more than one dimension per row becomes `Array` columns, rows of different lengths become `List` columns. The fits are returned as a polars DataFrame with a "parameter" column and a column per fit. Requires polars to be installed.
 
     Returns
     -------
-    data : dict or pd.DataFrame
+    data : dict or pd.DataFrame or pl.DataFrame or LazyDataSet
         The data from the data set.
     fit_dict : dict
         The fits of the data set, only returned if return_fits is True.
     """
+    if backend not in ("pandas", "polars"):
+        raise ValueError(f'Unknown backend "{backend}", use "pandas" or "polars".')
+    if backend == "polars" and not POLARS_INSTALLED and not lazy:
+        raise ImportError(
+            'The backend "polars" needs polars, install it or use backend="pandas".'
+        )
     with h5py.File(file_path, "r") as f:
         key = decide_entry_key(f, entry_key)
         if read_all_datasets:
@@ -60,6 +92,8 @@ def read_camels_file(
                     return_dataframe=return_dataframe,
                     read_variables=read_variables,
                     return_fits=return_fits,
+                    lazy=lazy,
+                    backend=backend,
                 )
             return data
         if data_set_key:
@@ -86,6 +120,8 @@ def read_camels_file(
             return_dataframe=return_dataframe,
             read_variables=read_variables,
             return_fits=return_fits,
+            lazy=lazy,
+            backend=backend,
         )
 
 
@@ -95,11 +131,18 @@ def _read_dataset(
     return_dataframe: bool = PANDAS_INSTALLED,
     read_variables: bool = True,
     return_fits: bool = False,
+    lazy: bool = False,
+    backend: str = "pandas",
 ):
     if dataset_name == "primary":
         data_set = data_group
     else:
         data_set = data_group[dataset_name]
+    if lazy:
+        data = LazyDataSet(data_set, read_variables=read_variables)
+        if return_fits:
+            return data, _read_fits(data_set)
+        return data
     data = {}
     for key in data_set:
         if (
@@ -113,13 +156,19 @@ def _read_dataset(
         if not isinstance(data_set[key], h5py.Dataset):
             continue
         data[key] = data_set[key][()]
-    fit_dict = {}
-    if return_fits and "fits" in data_set:
-        for fit_key in data_set["fits"]:
-            fit_dict[fit_key] = {}
-            for fit_val in data_set["fits"][fit_key]:
-                fit_dict[fit_key][fit_val] = data_set["fits"][fit_key][fit_val][()]
-    if return_dataframe and PANDAS_INSTALLED:
+    fit_dict = _read_fits(data_set) if return_fits else {}
+    if backend == "polars":
+        try:
+            df = _to_polars(data)
+            if return_fits:
+                return df, _fits_to_polars(fit_dict)
+            return df
+        except Exception as e:
+            print(
+                "An error occurred while trying to convert the data to a polars DataFrame. Returning the data as a dictionary instead."
+            )
+            print(e)
+    elif return_dataframe and PANDAS_INSTALLED:
         try:
             try:
                 df = pd.DataFrame(data)
@@ -150,6 +199,494 @@ def _read_dataset(
     return data
 
 
+def read_fit_index(file_path, entry_key: str = ""):
+    """
+    Read the fits of all data sets of a CAMELS file, without reading the data.
+
+    Parameters
+    ----------
+    file_path : str
+        Path to the CAMELS file.
+    entry_key : str, optional (default: "")
+        Entry-Key to read, see `read_camels_file`.
+
+    Returns
+    -------
+    FitIndex
+        The stored fits, keyed by (function, y, x, stream).
+    """
+    with h5py.File(file_path, "r") as f:
+        key = decide_entry_key(f, entry_key)
+        data = f[key]["data"]
+        fits = {"primary": _read_fits(data)}
+        for data_set_key in data:
+            if isinstance(data[data_set_key], h5py.Group) and data_set_key != "fits":
+                fits[data_set_key] = _read_fits(data[data_set_key])
+    return FitIndex(fits)
+
+
+def _read_fits(data_set):
+    fit_dict = {}
+    if "fits" in data_set:
+        for fit_key in data_set["fits"]:
+            fit_dict[fit_key] = {}
+            for fit_val in data_set["fits"][fit_key]:
+                fit_dict[fit_key][fit_val] = data_set["fits"][fit_key][fit_val][()]
+    return fit_dict
+
+
+class LazyDataSet(Mapping):
+    """A data set of a CAMELS file whose arrays are read when they are accessed.
+
+    When created, only the names, shapes and dtypes of the data are read. The
+    arrays are read from the file on first access and kept afterwards. The
+    returned arrays are read-only. The file is opened in SWMR mode if
+    possible, so that files still being written can be read as well.
+
+    Parameters
+    ----------
+    data_set : h5py.Group
+        The group of the data set in the open file.
+    read_variables : bool, optional (default: True)
+        Whether to include the variables of the data set.
+    memory_manager : MemoryManager, optional
+        If given, the read arrays are accounted by the manager, which may
+        unload them to stay within its budget.
+
+    Attributes
+    ----------
+    bytes_read : int
+        Number of bytes of data read from the file so far.
+    read_time : float
+        Time in seconds spent reading data from the file so far.
+    stats : dict
+        Statistics of the columns from the sidecar file written by
+        `column_stats.compute_column_stats`, see `read_column_stats`. Empty
+        if there is no such file or the file changed since.
+    """
+
+    def __init__(self, data_set, read_variables: bool = True, memory_manager=None):
+        self.file_path = data_set.file.filename
+        self.memory_manager = memory_manager
+        self._group_path = data_set.name
+        self._read_variables = read_variables
+        self._paths = {}
+        self._shapes = {}
+        self._dtypes = {}
+        self._arrays = {}
+        # Arrays that grow by `append_rows` are views of larger buffers.
+        self._buffers = {}
+        # Statistics of the reads from the file.
+        self.bytes_read = 0
+        self.read_time = 0.0
+        for key, dataset in _iter_columns(data_set, read_variables):
+            self._add_column(key, dataset)
+        self.stats = {
+            key: stats
+            for key, stats in read_column_stats(self.file_path, self._group_path).items()
+            if key in self._paths
+        }
+
+    def _add_column(self, key, dataset):
+        self._paths[key] = dataset.name
+        self._shapes[key] = dataset.shape
+        self._dtypes[key] = dataset.dtype
+
+    def __getitem__(self, key):
+        if key not in self._paths:
+            raise KeyError(key)
+        array = self._arrays.get(key)
+        if array is None:
+            start = time.perf_counter()
+            with _open_for_reading(self.file_path) as f:
+                array = self._set_array(key, f[self._paths[key]][()])
+            self._count_read(array.nbytes, start)
+        elif self.memory_manager is not None:
+            self.memory_manager.touch(self, key)
+        return array
+
+    def __iter__(self):
+        return iter(self._paths)
+
+    def __len__(self):
+        return len(self._paths)
+
+    def _set_array(self, key, array):
+        array = np.asarray(array)
+        array.flags.writeable = False
+        self._arrays[key] = array
+        self._buffers.pop(key, None)
+        if self.memory_manager is not None:
+            self.memory_manager.register(self, key, array.nbytes)
+        return array
+
+    def shape(self, key):
+        """The shape of the data `key`, without reading it."""
+        return self._shapes[key]
+
+    def dtype(self, key):
+        """The dtype of the data `key`, without reading it."""
+        return self._dtypes[key]
+
+    def value_range(self, key):
+        """The minimum and maximum of the data `key`.
+
+        Taken from `stats` if available, otherwise the data is read.
+        """
+        stats = self.stats.get(key)
+        if stats is not None:
+            return stats["min"], stats["max"]
+        array = self[key]
+        return array.min(), array.max()
+
+    def is_loaded(self, key):
+        """Whether the data `key` has already been read from the file."""
+        return key in self._arrays
+
+    def fetch(self, keys):
+        """Read several columns at once, opening the file only one time.
+
+        Parameters
+        ----------
+        keys : list of str
+            The names of the data to read. Names that are already loaded or
+            not in the data set are skipped.
+        """
+        missing = [
+            key
+            for key in dict.fromkeys(keys)
+            if key in self._paths and key not in self._arrays
+        ]
+        if not missing:
+            return
+        start = time.perf_counter()
+        with _open_for_reading(self.file_path) as f:
+            nbytes = sum(
+                self._set_array(key, f[self._paths[key]][()]).nbytes for key in missing
+            )
+        self._count_read(nbytes, start)
+
+    def _count_read(self, nbytes, start):
+        self.bytes_read += nbytes
+        self.read_time += time.perf_counter() - start
+
+    def unload(self, key):
+        """Drop the array of `key` from memory, it is read again on the next access."""
+        self._arrays.pop(key, None)
+        self._buffers.pop(key, None)
+        if self.memory_manager is not None:
+            self.memory_manager.forget(self, key)
+
+    def refresh(self):
+        """Read the rows that were appended to the file since the last read.
+
+        For files that are still being written, e.g. by a running measurement.
+        Only the new rows of the columns that are already loaded are read.
+
+        Returns
+        -------
+        list of str
+            The names of the data that changed.
+        """
+        return self.append_rows(self.read_new_rows())
+
+    def read_new_rows(self):
+        """Read what was added to the file, without changing the data set.
+
+        The file is opened in SWMR mode if possible, so that it can be read
+        while it is written. This only reads and can run in another thread,
+        the result is applied with `append_rows`.
+
+        Returns
+        -------
+        dict
+            "shapes": the current shape of every column,
+            "rows": the appended rows of the loaded columns,
+            "new": (path, shape, dtype) of columns that were added to the file,
+            "reload": names of loaded columns that changed in another way than
+            by appended rows.
+        """
+        update = {"shapes": {}, "rows": {}, "new": {}, "reload": []}
+        start = time.perf_counter()
+        with _open_for_reading(self.file_path) as f:
+            for key, dataset in _iter_columns(
+                f[self._group_path], self._read_variables
+            ):
+                if f.swmr_mode:
+                    dataset.refresh()
+                shape = dataset.shape
+                if key not in self._paths:
+                    update["new"][key] = (dataset.name, shape, dataset.dtype)
+                    continue
+                update["shapes"][key] = shape
+                array = self._arrays.get(key)
+                if array is None or shape == array.shape:
+                    continue
+                if (
+                    not shape
+                    or shape[1:] != array.shape[1:]
+                    or shape[0] < array.shape[0]
+                ):
+                    update["reload"].append(key)
+                    continue
+                update["rows"][key] = dataset[array.shape[0] :]
+        update["read_time"] = time.perf_counter() - start
+        return update
+
+    def append_rows(self, update):
+        """Apply the result of `read_new_rows`.
+
+        New rows are written into a buffer with spare capacity, so that
+        following appends do not copy the whole array again. Arrays returned
+        before stay valid.
+
+        Parameters
+        ----------
+        update : dict
+            The result of `read_new_rows`.
+
+        Returns
+        -------
+        list of str
+            The names of the data that changed.
+        """
+        changed = [
+            key
+            for key, shape in update["shapes"].items()
+            if key in self._shapes and shape != self._shapes[key]
+        ]
+        self._shapes.update(
+            (key, shape) for key, shape in update["shapes"].items() if key in self._paths
+        )
+        for key in changed:
+            # The statistics do not cover the new rows.
+            self.stats.pop(key, None)
+        for key in update["reload"]:
+            self.unload(key)
+        for key, rows in update["rows"].items():
+            array = self._arrays.get(key)
+            if array is None:
+                continue
+            if len(array) + len(rows) != self._shapes[key][0]:
+                # The array was unloaded and read again in the meantime.
+                self.unload(key)
+                continue
+            self._append(key, array, rows)
+            self.bytes_read += rows.nbytes
+        self.read_time += update.get("read_time", 0.0)
+        for key, (path, shape, dtype) in update["new"].items():
+            if key not in self._paths:
+                self._paths[key] = path
+                self._shapes[key] = shape
+                self._dtypes[key] = dtype
+                changed.append(key)
+        return changed
+
+    def _append(self, key, array, rows):
+        n_old = len(array)
+        n_new = n_old + len(rows)
+        buffer = self._buffers.get(key)
+        if buffer is None or len(buffer) < n_new:
+            # Grow geometrically, so appending n rows one by one costs O(n).
+            buffer = np.empty(
+                (max(n_new, 2 * n_old),) + array.shape[1:],
+                dtype=np.result_type(array, rows),
+            )
+            buffer[:n_old] = array
+        buffer[n_old:n_new] = rows
+        new_array = buffer[:n_new]
+        new_array.flags.writeable = False
+        self._arrays[key] = new_array
+        self._buffers[key] = buffer
+        if self.memory_manager is not None:
+            self.memory_manager.register(self, key, buffer.nbytes)
+
+    def loaded_bytes(self):
+        """The number of bytes of the arrays that are currently in memory."""
+        return sum(array.nbytes for array in list(self._arrays.values()))
+
+
+class MemoryManager:
+    """Keeps the arrays read by `LazyDataSet`s within a memory budget.
+
+    The manager accounts the size of every array that is read. When the total
+    exceeds the budget, the least recently used arrays are unloaded from their
+    data sets, they are read again from the file on the next access.
+
+    Parameters
+    ----------
+    budget : int, optional (default: 2 GiB)
+        The budget in bytes.
+    in_use : callable, optional
+        Returns the (data set, key) pairs that are currently used and must not
+        be unloaded.
+    """
+
+    def __init__(self, budget: int = 2 * 1024**3, in_use=None):
+        self.budget = budget
+        self.in_use = in_use
+        self._columns = OrderedDict()
+        self._lock = threading.RLock()
+
+    def register(self, data_set, key, nbytes):
+        """Account a newly read array and unload others if over budget."""
+        with self._lock:
+            self._columns[(id(data_set), key)] = (data_set, key, nbytes)
+            self._columns.move_to_end((id(data_set), key))
+            self.evict(keep=(id(data_set), key))
+
+    def touch(self, data_set, key):
+        """Mark an array as recently used."""
+        with self._lock:
+            if (id(data_set), key) in self._columns:
+                self._columns.move_to_end((id(data_set), key))
+
+    def forget(self, data_set, key):
+        """Remove an unloaded array from the accounting."""
+        with self._lock:
+            self._columns.pop((id(data_set), key), None)
+
+    def evict(self, keep=None):
+        """Unload least recently used arrays until the total is within the budget.
+
+        Parameters
+        ----------
+        keep : tuple, optional
+            Identifier (id(data set), key) of an array that must not be unloaded.
+        """
+        with self._lock:
+            if self.total_bytes() <= self.budget:
+                return
+            in_use = set()
+            if self.in_use is not None:
+                in_use = {(id(data_set), key) for data_set, key in self.in_use()}
+            total = self.total_bytes()
+            for ident, (data_set, key, nbytes) in list(self._columns.items()):
+                if total <= self.budget:
+                    break
+                if ident == keep or ident in in_use:
+                    continue
+                data_set.unload(key)
+                total -= nbytes
+
+    def total_bytes(self):
+        """The number of bytes of all accounted arrays."""
+        with self._lock:
+            return sum(nbytes for _, _, nbytes in self._columns.values())
+
+    def bytes_per_file(self):
+        """The number of accounted bytes for each file.
+
+        Returns
+        -------
+        dict
+            The bytes keyed by the path of the file.
+        """
+        per_file = {}
+        with self._lock:
+            for data_set, _, nbytes in self._columns.values():
+                per_file[data_set.file_path] = (
+                    per_file.get(data_set.file_path, 0) + nbytes
+                )
+        return per_file
+
+    def bytes_per_column(self):
+        """The number of accounted bytes for each array.
+
+        Returns
+        -------
+        dict
+            The bytes keyed by (path of the file, key).
+        """
+        with self._lock:
+            return {
+                (data_set.file_path, key): nbytes
+                for data_set, key, nbytes in self._columns.values()
+            }
+
+
+def _iter_columns(data_set, read_variables=True):
+    """Yield (name, h5py.Dataset) of the data in a data set group."""
+    for key in data_set:
+        item = data_set[key]
+        if (
+            read_variables
+            and isinstance(item, h5py.Group)
+            and key.endswith("_variable_signal")
+        ):
+            for sub_key in item:
+                yield sub_key, item[sub_key]
+            continue
+        if isinstance(item, h5py.Dataset):
+            yield key, item
+
+
+def _open_for_reading(file_path):
+    """Open a file that may still be written, in SWMR mode if the file allows it."""
+    try:
+        return h5py.File(file_path, "r", swmr=True)
+    except (OSError, ValueError):
+        return h5py.File(file_path, "r")
+
+
+def _to_polars(data):
+    """Build a polars DataFrame from the arrays of a data set.
+
+    Numeric arrays are used without copying. Arrays with more than one
+    dimension become `Array` columns, object arrays (e.g. rows of different
+    lengths) become `List` columns.
+
+    Parameters
+    ----------
+    data : dict
+        The arrays of the data set.
+
+    Returns
+    -------
+    pl.DataFrame
+        The data.
+    """
+    columns = []
+    for key, value in data.items():
+        value = np.asarray(value)
+        if value.dtype.kind == "O":
+            columns.append(pl.Series(key, value.tolist()))
+        else:
+            columns.append(pl.Series(key, value))
+    return pl.DataFrame(columns)
+
+
+def _fits_to_polars(fit_dict):
+    """Build a polars DataFrame from the fits of a data set.
+
+    As the pandas DataFrame of the fits, it has a row per parameter, the
+    parameter names are in the column "parameter". Fits that were stored
+    several times have `List` columns of the values.
+
+    Parameters
+    ----------
+    fit_dict : dict
+        The parameters of every fit, as returned by `_read_fits`.
+
+    Returns
+    -------
+    pl.DataFrame
+        The fits.
+    """
+    params = list(dict.fromkeys(param for fit in fit_dict.values() for param in fit))
+    columns = [pl.Series("parameter", params, dtype=pl.String)]
+    for fit_name, fit in fit_dict.items():
+        values = [fit.get(param) for param in params]
+        if all(value is None or np.ndim(value) == 0 for value in values):
+            values = [
+                None if value is None else np.asarray(value).item() for value in values
+            ]
+        else:
+            values = [None if value is None else np.ravel(value) for value in values]
+        columns.append(pl.Series(fit_name, values))
+    return pl.DataFrame(columns)
+
+
 def _change_arrays_to_lists(data):
     """Changes arrays in a dictionary to lists. This is necessary for creating a pandas DataFrame from the data if the arrays have different shapes.
 
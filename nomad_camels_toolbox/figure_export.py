@@ -0,0 +1,235 @@
+"""Compact serialization of the plotly figures created by `recreate_plots`.
+
+The numeric data of the figures is stored as base64-encoded typed arrays in
+the format understood by plotly.js (`{"dtype": ..., "bdata": ..., "shape": ...}`).
+Arrays that are used by several traces (e.g. the same x column for several y
+traces and their fits) are stored only once in an `arrays` table and
+referenced from the traces by `{"$array": <key>}`.
+"""
+
+import base64
+import hashlib
+import json
+
+import numpy as np
+import plotly.graph_objects as go
+from plotly.utils import PlotlyJSONEncoder
+
+COMPACT_FORMAT_NAME = "camels-compact-figure"
+COMPACT_FORMAT_VERSION = 1
+
+# dtypes supported by the typed arrays of plotly.js
+_typed_array_dtypes = {
+    "i1": np.int8,
+    "u1": np.uint8,
+    "i2": np.int16,
+    "u2": np.uint16,
+    "i4": np.int32,
+    "u4": np.uint32,
+    "f4": np.float32,
+    "f8": np.float64,
+}
+
+
+def write_compact_figure(figure, file, float32=False):
+    """Write a plotly figure with its data as deduplicated typed arrays.
+
+    The JSON is written to the file piece by piece, only one array is held in
+    its encoded form at a time.
+
+    Parameters
+    ----------
+    figure : plotly.graph_objects.Figure or dict
+        The figure to write.
+    file : str or file-like
+        Path of the file to write or an open text file.
+    float32 : bool, optional
+        If True, floating point data is stored with single precision. Default is False.
+    """
+    fig_dict, arrays = _extract_arrays(figure, float32=float32)
+    if isinstance(file, str):
+        with open(file, "w", encoding="utf-8") as f:
+            _write_compact(f, fig_dict, arrays)
+    else:
+        _write_compact(file, fig_dict, arrays)
+
+
+def figure_to_compact_dict(figure, float32=False):
+    """Convert a plotly figure into the compact representation.
+
+    Parameters
+    ----------
+    figure : plotly.graph_objects.Figure or dict
+        The figure to convert.
+    float32 : bool, optional
+        If True, floating point data is stored with single precision. Default is False.
+
+    Returns
+    -------
+    dict
+        The compact representation, as written by `write_compact_figure`.
+    """
+    fig_dict, arrays = _extract_arrays(figure, float32=float32)
+    return {
+        "format": COMPACT_FORMAT_NAME,
+        "version": COMPACT_FORMAT_VERSION,
+        "arrays": {key: _encode_array(arr) for key, arr in arrays.items()},
+        "figure": fig_dict,
+    }
+
+
+def read_compact_figure(file):
+    """Read a figure written by `write_compact_figure`.
+
+    Parameters
+    ----------
+    file : str or file-like
+        Path of the file or an open text file.
+
+    Returns
+    -------
+    plotly.graph_objects.Figure
+        The restored figure.
+    """
+    if isinstance(file, str):
+        with open(file, "r", encoding="utf-8") as f:
+            compact = json.load(f)
+    else:
+        compact = json.load(file)
+    return compact_dict_to_figure(compact)
+
+
+def compact_dict_to_figure(compact):
+    """Restore a plotly figure from its compact representation.
+
+    Parameters
+    ----------
+    compact : dict
+        The compact representation as returned by `figure_to_compact_dict`.
+
+    Returns
+    -------
+    plotly.graph_objects.Figure
+        The restored figure.
+    """
+    if compact.get("format") != COMPACT_FORMAT_NAME:
+        raise ValueError("The given data is not a compact CAMELS figure.")
+    arrays = {key: _decode_array(val) for key, val in compact["arrays"].items()}
+    fig_dict = _insert_arrays(compact["figure"], arrays)
+    return go.Figure(fig_dict)
+
+
+def _write_compact(f, fig_dict, arrays):
+    f.write(
+        f'{{"format": "{COMPACT_FORMAT_NAME}", '
+        f'"version": {COMPACT_FORMAT_VERSION}, "arrays": {{'
+    )
+    for i, (key, arr) in enumerate(arrays.items()):
+        if i:
+            f.write(", ")
+        f.write(f'"{key}": ')
+        json.dump(_encode_array(arr), f)
+    f.write('}, "figure": ')
+    json.dump(fig_dict, f, cls=PlotlyJSONEncoder)
+    f.write("}")
+
+
+def _extract_arrays(figure, float32=False):
+    """Replace the numeric arrays of the traces by references.
+
+    Returns the figure dictionary and a dictionary of the unique arrays.
+    """
+    if isinstance(figure, dict):
+        fig_dict = dict(figure)
+    else:
+        fig_dict = figure.to_dict()
+    arrays = {}
+    known = {}
+
+    def replace(value):
+        if isinstance(value, dict):
+            if "bdata" in value and "dtype" in value:
+                arr = _decode_array(value)
+            else:
+                return {k: replace(v) for k, v in value.items()}
+        elif isinstance(value, (np.ndarray, list, tuple)):
+            arr = _as_numeric_array(value)
+            if arr is None:
+                if isinstance(value, np.ndarray):
+                    return value
+                return [replace(v) for v in value]
+        else:
+            return value
+        arr = _to_typed_array_dtype(arr, float32=float32)
+        digest = hashlib.blake2b(
+            np.ascontiguousarray(arr).tobytes(), digest_size=16
+        ).hexdigest()
+        identity = (arr.dtype.str, arr.shape, digest)
+        if identity not in known:
+            known[identity] = f"a{len(known)}"
+            arrays[known[identity]] = arr
+        return {"$array": known[identity]}
+
+    fig_dict["data"] = [replace(trace) for trace in fig_dict.get("data", [])]
+    return fig_dict, arrays
+
+
+def _as_numeric_array(value):
+    """Return `value` as a numeric numpy array or None if it is not numeric."""
+    try:
+        arr = np.asarray(value)
+    except ValueError:
+        return None
+    if arr.ndim == 0 or arr.dtype.kind not in "iuf":
+        return None
+    return arr
+
+
+def _to_typed_array_dtype(arr, float32=False):
+    """Cast the array to a dtype that plotly.js typed arrays support."""
+    if arr.dtype.kind == "f":
+        if float32 or arr.dtype.itemsize < 4:
+            return arr.astype(np.float32, copy=False)
+        return arr.astype(np.float64, copy=False)
+    if arr.dtype.itemsize <= 4:
+        return arr
+    if arr.size == 0 or (
+        arr.min() >= np.iinfo(np.int32).min and arr.max() <= np.iinfo(np.int32).max
+    ):
+        return arr.astype(np.int32)
+    return arr.astype(np.float64)
+
+
+def _encode_array(arr):
+    dtype = np.dtype(arr.dtype).newbyteorder("<")
+    code = f"{dtype.kind}{dtype.itemsize}"
+    encoded = {
+        "dtype": code,
+        "bdata": base64.b64encode(
+            np.ascontiguousarray(arr, dtype=dtype).tobytes()
+        ).decode("ascii"),
+    }
+    if arr.ndim > 1:
+        encoded["shape"] = ", ".join(str(s) for s in arr.shape)
+    return encoded
+
+
+def _decode_array(encoded):
+    dtype = np.dtype(_typed_array_dtypes[encoded["dtype"]]).newbyteorder("<")
+    arr = np.frombuffer(base64.b64decode(encoded["bdata"]), dtype=dtype)
+    shape = encoded.get("shape")
+    if shape:
+        if isinstance(shape, str):
+            shape = [int(s) for s in shape.split(",")]
+        arr = arr.reshape(shape)
+    return arr
+
+
+def _insert_arrays(value, arrays):
+    if isinstance(value, dict):
+        if "$array" in value:
+            return arrays[value["$array"]]
+        return {k: _insert_arrays(v, arrays) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_insert_arrays(v, arrays) for v in value]
+    return value
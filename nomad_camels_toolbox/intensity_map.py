@@ -0,0 +1,422 @@
+"""
+GUI-independent computations behind the integrated-intensity images of the
+`CAMELS_Viewer`.
+
+The points of a scan are sorted by the image X axis and then by the image Y
+axis, the unique values of both axes span the image grid. The intensity of
+each point is the trapezoidal integral of its spectrum over the points inside
+the selected range. The spectra of a region of the image can be reduced to a
+single spectrum with `SpectrumCube`.
+"""
+
+import numpy as np
+
+
+def map_grid(data, x_ax, y_ax=None, filters=None):
+    """Arrange the points of a scan on the image grid of the viewer.
+
+    Parameters
+    ----------
+    data : dict or pandas.DataFrame
+        The data of the scan.
+    x_ax : str
+        Name of the 1D data used as image X axis.
+    y_ax : str, optional
+        Name of the 1D data used as image Y axis. If not provided or "None",
+        all points have the same Y value 0.
+    filters : dict, optional
+        Only points whose values equal the given values are used, or that lie
+        in the range for (min, max) tuples, see `filter_mask`.
+
+    Returns
+    -------
+    dict
+        "rows": the indices of the used points of `data`, sorted by X and Y,
+        "x_values", "y_values": the sorted unique values of the image axes,
+        "ix", "iy": the grid indices of each point in "rows",
+        "lookup": array of shape (len(x_values), len(y_values)) with the
+        position in "rows" of the point at each grid position, -1 where the
+        grid has no point.
+    """
+    x_ax_data = np.asarray(data[x_ax])
+    mask = filter_mask(data, filters, len(x_ax_data))
+    if y_ax and y_ax != "None":
+        y_ax_data = np.asarray(data[y_ax])
+    else:
+        y_ax_data = np.zeros(len(x_ax_data))
+    if x_ax_data.ndim != 1 or y_ax_data.ndim != 1:
+        raise ValueError("Please select 1D data for x and y axes.")
+    rows = np.flatnonzero(mask)
+    rows = rows[np.lexsort((y_ax_data[rows], x_ax_data[rows]))]
+    x_values, ix = np.unique(x_ax_data[rows], return_inverse=True)
+    y_values, iy = np.unique(y_ax_data[rows], return_inverse=True)
+    lookup = np.full((len(x_values), len(y_values)), -1, dtype=np.intp)
+    lookup[ix, iy] = np.arange(len(rows))
+    return {
+        "rows": rows,
+        "x_values": x_values,
+        "y_values": y_values,
+        "ix": ix,
+        "iy": iy,
+        "lookup": lookup,
+    }
+
+
+def prepare_intensity_map(
+    data, x_name, y_name, x_ax, y_ax=None, filters=None, index=None
+):
+    """Arrange the spectra of a scan for integrated-intensity images.
+
+    This is what the `CAMELS_Viewer` computes once per selection, the
+    intensities for any range are then given by the integrator.
+
+    Parameters
+    ----------
+    data : dict or pandas.DataFrame
+        The data of the scan.
+    x_name : str
+        Name of the x values of the spectra.
+    y_name : str
+        Name of the spectra.
+    x_ax : str
+        Name of the 1D data used as image X axis.
+    y_ax : str, optional
+        Name of the 1D data used as image Y axis, see `map_grid`.
+    filters : dict, optional
+        The filters of the points, see `filter_mask`.
+    index : dict, optional
+        A result of `map_grid` for the same data, axes and filters, e.g. stored
+        in a session of the viewer. If given, the points are not sorted again.
+
+    Returns
+    -------
+    dict
+        "index": the result of `map_grid`,
+        "x", "y": the x values and spectra in the order of the image points,
+        "integrator": a `CumulativeIntegrator` of the spectra.
+
+    Raises
+    ------
+    ValueError
+        If no complete image can be made of the selection, with the message
+        shown by the viewer.
+    """
+    if x_ax == y_ax:
+        raise ValueError("Select different axes for the image.")
+    if index is None:
+        try:
+            index = map_grid(data, x_ax, y_ax, filters)
+        except Exception as e:
+            raise ValueError(
+                f"Could not make an image of the axes,\nplease check the data and your selection.\n{e}"
+            ) from e
+    # Check if filtering left any data.
+    if not len(index["rows"]):
+        raise ValueError("No data left after filtering.\nCheck your filters!")
+    shape = index["lookup"].shape
+    if len(index["rows"]) != shape[0] * shape[1]:
+        raise ValueError(
+            "Error: incompatible data shapes.\nYou may need to select other axes for the image.\n"
+            f"cannot reshape {len(index['rows'])} points into shape {shape}"
+        )
+    rows = index["rows"]
+    x = np.asarray(data[x_name])[rows]
+    y = np.asarray(data[y_name])[rows]
+    return {
+        "index": index,
+        "x": x,
+        "y": y,
+        "integrator": CumulativeIntegrator(x, y),
+    }
+
+
+def integrated_intensity_map(
+    data, x_name, y_name, x_ax, y_ax=None, filters=None, x_range=None
+):
+    """Compute the integrated-intensity image of a scan as the viewer shows it.
+
+    Parameters
+    ----------
+    data : dict or pandas.DataFrame
+        The data of the scan.
+    x_name : str
+        Name of the x values of the spectra.
+    y_name : str
+        Name of the spectra.
+    x_ax : str
+        Name of the 1D data used as image X axis.
+    y_ax : str, optional
+        Name of the 1D data used as image Y axis, see `map_grid`.
+    filters : dict, optional
+        The filters of the points, see `filter_mask`.
+    x_range : tuple, optional
+        (lo, hi) of the integration. If not provided, the whole range of the
+        x values is used, as the initial position of the viewer's lines.
+
+    Returns
+    -------
+    dict
+        "x_values", "y_values": the values of the image axes,
+        "image": the (len(x_values), len(y_values)) integrated intensities,
+        "x_range": the used integration range,
+        "prepared": the result of `prepare_intensity_map`.
+    """
+    prepared = prepare_intensity_map(data, x_name, y_name, x_ax, y_ax, filters)
+    if x_range is None:
+        x_all = np.asarray(data[x_name]).astype(float, copy=False)
+        x_range = (x_all.min(), x_all.max())
+    lo, hi = x_range
+    index = prepared["index"]
+    intensities = prepared["integrator"].integrate(lo, hi)
+    return {
+        "x_values": index["x_values"],
+        "y_values": index["y_values"],
+        "image": intensities.reshape(index["lookup"].shape),
+        "x_range": (lo, hi),
+        "prepared": prepared,
+    }
+
+
+def filter_mask(data, filters, n_points):
+    """Boolean mask of the points whose values equal the given filter values.
+
+    The filter values are converted to the type of the data first, so the
+    string values from the viewer's filter widgets can be used. A (min, max)
+    tuple selects the points with min <= value <= max.
+
+    Parameters
+    ----------
+    data : dict or pandas.DataFrame
+        The data of the scan.
+    filters : dict or None
+        The values or ranges to filter for, keyed by the name of the data.
+    n_points : int
+        The number of points of the scan.
+    """
+    mask = np.ones(n_points, dtype=bool)
+    for key, filter_val in (filters or {}).items():
+        column = np.asarray(data[key])
+        if isinstance(filter_val, tuple):
+            lo, hi = filter_val
+            mask &= (column >= lo) & (column <= hi)
+            continue
+        try:
+            filter_val = column.dtype.type(filter_val)
+        except Exception as e:
+            print(e)
+        mask &= column == filter_val
+    return mask
+
+
+class CumulativeIntegrator:
+    """
+    Answers integrals of many spectra over arbitrary ranges by lookups in
+    precomputed cumulative trapezoidal integrals.
+
+    The result for a range [lo, hi] is the same as `np.trapezoid` over the
+    points of each spectrum with lo <= x <= hi.
+
+    Parameters
+    ----------
+    x : array-like
+        The x values of the spectra, shape (n_spectra, n_points) or (n_points,)
+        if all spectra share the same x values.
+    y : array-like
+        The spectra, shape (n_spectra, n_points).
+    """
+
+    def __init__(self, x, y):
+        y = np.asarray(y, dtype=float)
+        x = np.asarray(x, dtype=float)
+        if x.ndim == 1 or (len(x) and (x == x[0]).all()):
+            # All spectra share their x values, a single search is enough.
+            self.shared_x = True
+            x = x if x.ndim == 1 else x[0]
+            x = np.broadcast_to(x, y.shape)
+        else:
+            self.shared_x = False
+        steps = np.diff(x, axis=1)
+        # Descending spectra give negative integrals, as with np.trapezoid.
+        self.descending = bool(steps.size) and bool((steps <= 0).all())
+        if self.descending:
+            x = x[:, ::-1]
+            y = y[:, ::-1]
+            steps = -steps[:, ::-1]
+        # Unsorted or non-finite spectra are integrated one by one.
+        self.exact = bool((steps >= 0).all() and np.isfinite(y).all())
+        self.x = x
+        self.y = y
+        self.cumulative = np.zeros(y.shape)
+        if self.exact and y.shape[1] > 1:
+            segments = 0.5 * (y[:, 1:] + y[:, :-1]) * steps
+            np.cumsum(segments, axis=1, out=self.cumulative[:, 1:])
+
+    def integrate(self, lo, hi):
+        """
+        Integrate all spectra over the points with lo <= x <= hi.
+
+        Parameters
+        ----------
+        lo, hi : float
+            The bounds of the integration range.
+
+        Returns
+        -------
+        numpy.ndarray
+            The integral of each spectrum.
+        """
+        if not self.exact:
+            return self._integrate_loop(lo, hi)
+        if self.shared_x:
+            first = np.full(len(self.y), np.searchsorted(self.x[0], lo, "left"))
+            last = np.full(len(self.y), np.searchsorted(self.x[0], hi, "right") - 1)
+        else:
+            first = (self.x < lo).sum(axis=1)
+            last = (self.x <= hi).sum(axis=1) - 1
+        rows = np.arange(len(self.y))
+        first_c = np.minimum(first, self.y.shape[1] - 1)
+        last_c = np.maximum(last, 0)
+        values = self.cumulative[rows, last_c] - self.cumulative[rows, first_c]
+        # Less than two points inside the range integrate to zero.
+        values[last <= first] = 0.0
+        if self.descending:
+            values = -values
+        return values
+
+    def _integrate_loop(self, lo, hi):
+        """Integrate spectrum by spectrum, used if the x values are unsorted."""
+        x, y = self.x, self.y
+        if self.descending:
+            x, y = x[:, ::-1], y[:, ::-1]
+        values = np.empty(len(y))
+        for i, (x_val, y_val) in enumerate(zip(x, y)):
+            inside = (x_val >= lo) & (x_val <= hi)
+            values[i] = np.trapezoid(y_val[inside], x=x_val[inside])
+        return values
+
+
+class SpectrumCube:
+    """
+    The spectra of an image arranged as a dense (nx, ny, n_points) cube, to
+    reduce them over rectangular regions of the image.
+
+    The sum and the number of finite values of the last region are kept. When
+    the region moves or changes its size, only the pixels that entered or left
+    it are added or subtracted.
+
+    Parameters
+    ----------
+    x : array-like
+        The x values of the spectra in the order of `grid["rows"]`, shape
+        (n_spectra, n_points) or (n_points,) if shared by all spectra.
+    y : array-like
+        The spectra in the order of `grid["rows"]`, shape (n_spectra, n_points).
+    grid : dict
+        The result of `map_grid`.
+    """
+
+    def __init__(self, x, y, grid):
+        y = np.asarray(y, dtype=float)
+        x = np.asarray(x, dtype=float)
+        lookup = grid["lookup"]
+        valid = lookup >= 0
+        self.shared_x = x.ndim == 1
+        channels = [y] if self.shared_x else [x, y]
+        self.x = x if self.shared_x else None
+        # NaN are stored as 0 and excluded by the counts.
+        cube = np.zeros(lookup.shape + (len(channels), y.shape[1]))
+        self.finite = np.zeros(lookup.shape + (len(channels), y.shape[1]), dtype=bool)
+        for i, values in enumerate(channels):
+            values = values[lookup[valid]]
+            finite = np.isfinite(values)
+            cube[valid, i] = np.where(finite, values, 0.0)
+            self.finite[valid, i] = finite
+        self.cube = cube
+        self._region = None
+        self._sum = None
+        self._count = None
+
+    def region(self, ix0, ix1, iy0, iy1, reduce="mean"):
+        """
+        Reduce the spectra of the pixels ix0 <= ix < ix1, iy0 <= iy < iy1.
+
+        Parameters
+        ----------
+        ix0, ix1, iy0, iy1 : int
+            The region, the upper limits are excluded.
+        reduce : str, optional
+            "mean", "sum" or "max" of the spectra. The x values are always averaged.
+
+        Returns
+        -------
+        tuple of numpy.ndarray
+            The x values and the reduced spectrum. Points without any finite
+            value in the region are NaN.
+        """
+        region = (ix0, ix1, iy0, iy1)
+        self._update_sum(region)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = self._sum / self._count
+        x = self.x if self.shared_x else mean[0]
+        if reduce == "mean":
+            y = mean[-1]
+        elif reduce == "sum":
+            y = np.where(self._count[-1] > 0, self._sum[-1], np.nan)
+        elif reduce == "max":
+            part = self.cube[ix0:ix1, iy0:iy1, -1]
+            finite = self.finite[ix0:ix1, iy0:iy1, -1]
+            y = np.where(finite, part, -np.inf).max(axis=(0, 1), initial=-np.inf)
+            y[self._count[-1] == 0] = np.nan
+        else:
+            raise ValueError(f'Unknown reduction "{reduce}".')
+        return x, y
+
+    def _update_sum(self, region):
+        """Update the sum and count from the last region, or compute them."""
+        if region == self._region:
+            return
+        if self._region is not None:
+            leaving = _subtract_rect(self._region, region)
+            entering = _subtract_rect(region, self._region)
+            changed = sum(_rect_area(r) for r in leaving + entering)
+            if changed < _rect_area(region):
+                for r in leaving:
+                    self._sum -= self._rect_sum(self.cube, r)
+                    self._count -= self._rect_sum(self.finite, r)
+                for r in entering:
+                    self._sum += self._rect_sum(self.cube, r)
+                    self._count += self._rect_sum(self.finite, r)
+                self._region = region
+                return
+        self._sum = self._rect_sum(self.cube, region)
+        self._count = self._rect_sum(self.finite, region)
+        self._region = region
+
+    @staticmethod
+    def _rect_sum(cube, rect):
+        ix0, ix1, iy0, iy1 = rect
+        dtype = np.int64 if cube.dtype == bool else cube.dtype
+        return cube[ix0:ix1, iy0:iy1].sum(axis=(0, 1), dtype=dtype)
+
+
+def _rect_area(rect):
+    ix0, ix1, iy0, iy1 = rect
+    return max(ix1 - ix0, 0) * max(iy1 - iy0, 0)
+
+
+def _subtract_rect(a, b):
+    """The part of rectangle a outside of rectangle b, as up to four rectangles."""
+    ax0, ax1, ay0, ay1 = a
+    bx0, bx1, by0, by1 = b
+    # Limit b to a, if they do not overlap, a remains.
+    bx0, bx1 = max(ax0, bx0), min(ax1, bx1)
+    by0, by1 = max(ay0, by0), min(ay1, by1)
+    if bx0 >= bx1 or by0 >= by1:
+        return [a]
+    parts = [
+        (ax0, bx0, ay0, ay1),
+        (bx1, ax1, ay0, ay1),
+        (bx0, bx1, ay0, by0),
+        (bx0, bx1, by1, ay1),
+    ]
+    return [r for r in parts if _rect_area(r)]
@@ -0,0 +1,245 @@
+"""
+Batch export of the integrated-intensity maps of the `CAMELS_Viewer`.
+
+The maps are computed by `intensity_map.integrated_intensity_map`, the same
+code the viewer uses, so the exported numbers are the ones shown there.
+"""
+
+import importlib.util
+import json
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import h5py
+import numpy as np
+
+try:
+    from .data_reader import read_camels_file
+    from .intensity_map import SpectrumCube, integrated_intensity_map
+    from .utils.file_names import unique_file_stems
+except ImportError:
+    # The viewer is also started from within this directory.
+    from data_reader import read_camels_file
+    from intensity_map import SpectrumCube, integrated_intensity_map
+    from utils.file_names import unique_file_stems
+
+
+def export_intensity_maps(
+    paths,
+    out_dir,
+    x_name,
+    y_name,
+    x_ax,
+    y_ax=None,
+    filters=None,
+    x_range=None,
+    fmt="npy",
+    png=True,
+    roi=None,
+    roi_reduce="mean",
+    workers=None,
+    entry_key: str = "",
+    data_set_key: str = "",
+):
+    """Compute the integrated-intensity maps of many CAMELS files in parallel
+    and write them to disk.
+
+    Every file is handled in a separate worker process, only the needed data
+    is read from it. The results of a file are written to `out_dir` with the
+    name of the file as prefix, files with the same name get a suffix "_2",
+    "_3", ... in the order of `paths`.
+
+    As this function uses multiple processes, scripts calling it on Windows or
+    macOS must be protected by `if __name__ == "__main__":`.
+
+    Parameters
+    ----------
+    paths : list of str
+        Paths to the CAMELS files.
+    out_dir : str
+        Directory to write the results to. It is created if it does not exist.
+    x_name : str
+        Name of the x values of the spectra (the viewer's X column).
+    y_name : str
+        Name of the spectra (the viewer's Y column).
+    x_ax : str
+        Name of the 1D data used as image X axis.
+    y_ax : str, optional
+        Name of the 1D data used as image Y axis. If not provided, the map is
+        a curve over `x_ax`.
+    filters : dict, optional
+        Values or (min, max) ranges of other data, as the viewer's filters.
+    x_range : tuple, optional
+        (lo, hi) of the integration. If not provided, the whole range of the
+        x values is used.
+    fmt : str, optional
+        "npy" writes `<name>_intensity.npy`, `<name>_x_values.npy` and
+        `<name>_y_values.npy`, "hdf5" writes all into `<name>_intensity.h5`
+        together with the settings. Default is "npy".
+    png : bool, optional
+        If True, the map is also rendered offscreen into `<name>_intensity.png`.
+        Needs PySide6 and pyqtgraph. Default is True.
+    roi : tuple, optional
+        (ix0, ix1, iy0, iy1) index range of the image, the upper limits
+        excluded. If given, the spectrum of the region is written as well,
+        `<name>_roi.npy` holds its x values and the spectrum.
+    roi_reduce : str, optional
+        "mean", "sum" or "max" of the spectra in the ROI. Default is "mean".
+    workers : int, optional
+        Number of worker processes. If not provided, the number of CPUs is used.
+    entry_key : str, optional
+        The entry key to use for reading the files.
+    data_set_key : str, optional
+        The data set to read, the main data set if not provided.
+
+    Returns
+    -------
+    dict
+        A dictionary mapping each input path to the list of written files.
+        Files that could not be processed map to an empty list.
+    """
+    if fmt not in ("npy", "hdf5"):
+        raise ValueError(f'Unknown format "{fmt}", use "npy" or "hdf5".')
+    if png:
+        if not all(importlib.util.find_spec(m) for m in ("pyqtgraph", "PySide6")):
+            raise ImportError(
+                "Rendering PNGs needs PySide6 and pyqtgraph, install them or use png=False."
+            )
+    os.makedirs(out_dir, exist_ok=True)
+    settings = {
+        "x_name": x_name,
+        "y_name": y_name,
+        "x_ax": x_ax,
+        "y_ax": y_ax,
+        "filters": filters,
+        "x_range": x_range,
+        "roi": roi,
+        "roi_reduce": roi_reduce,
+    }
+    stems = unique_file_stems(paths, "map")
+    written = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                _export_map,
+                path,
+                os.path.join(out_dir, stems[path]),
+                settings,
+                fmt,
+                png,
+                entry_key,
+                data_set_key,
+            ): path
+            for path in paths
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                written[path] = future.result()
+            except Exception as e:
+                warnings.warn(f"Could not export the map of {path}.\n{e}")
+                written[path] = []
+    return {path: written[path] for path in paths}
+
+
+def _export_map(file_path, prefix, settings, fmt, png, entry_key, data_set_key):
+    """Worker for `export_intensity_maps`, computes and writes the map of one
+    file, the names of the written files start with `prefix`."""
+    data = read_camels_file(
+        file_path,
+        entry_key=entry_key,
+        data_set_key=data_set_key,
+        lazy=True,
+    )
+    data.fetch(
+        [
+            settings["x_name"],
+            settings["y_name"],
+            settings["x_ax"],
+            settings["y_ax"],
+            *(settings["filters"] or {}),
+        ]
+    )
+    result = integrated_intensity_map(
+        data,
+        settings["x_name"],
+        settings["y_name"],
+        settings["x_ax"],
+        settings["y_ax"],
+        settings["filters"],
+        settings["x_range"],
+    )
+    written = []
+    if fmt == "npy":
+        for key in ("image", "x_values", "y_values"):
+            name = "intensity" if key == "image" else key
+            np.save(f"{prefix}_{name}.npy", result[key])
+            written.append(f"{prefix}_{name}.npy")
+    else:
+        with h5py.File(f"{prefix}_intensity.h5", "w") as f:
+            for key in ("image", "x_values", "y_values"):
+                f[key] = result[key]
+            f.attrs["source"] = file_path
+            f.attrs["x_range"] = result["x_range"]
+            f.attrs["settings"] = json.dumps(settings, default=str)
+        written.append(f"{prefix}_intensity.h5")
+    if settings["roi"] is not None:
+        prepared = result["prepared"]
+        x = prepared["x"]
+        if prepared["integrator"].shared_x and x.ndim == 2:
+            x = x[0]
+        cube = SpectrumCube(x, prepared["y"], prepared["index"])
+        spectrum = cube.region(*settings["roi"], reduce=settings["roi_reduce"])
+        np.save(f"{prefix}_roi.npy", np.array(spectrum))
+        written.append(f"{prefix}_roi.npy")
+    if png:
+        _render_png(result, f"{prefix}_intensity.png", settings)
+        written.append(f"{prefix}_intensity.png")
+    return written
+
+
+def _render_png(result, path, settings):
+    """Render the map offscreen with pyqtgraph, an image or a curve if it has
+    a single Y value."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6 import QtCore, QtWidgets
+    import pyqtgraph as pg
+    import pyqtgraph.exporters
+
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    widget = pg.GraphicsLayoutWidget()
+    widget.setBackground("w")
+    widget.resize(800, 600)
+    plot = widget.addPlot(title=f"integrated intensity {settings['y_name']}")
+    plot.setLabel("bottom", settings["x_ax"])
+    x_values = result["x_values"]
+    y_values = result["y_values"]
+    image = result["image"]
+    if len(y_values) > 1:
+        item = pg.ImageItem(image, levels=(np.nanmin(image), np.nanmax(image)))
+        # Place the pixels at the values of the axes.
+        x_step = (x_values[-1] - x_values[0]) / max(len(x_values) - 1, 1) or 1
+        y_step = (y_values[-1] - y_values[0]) / max(len(y_values) - 1, 1) or 1
+        item.setRect(
+            QtCore.QRectF(
+                x_values[0] - x_step / 2,
+                y_values[0] - y_step / 2,
+                x_step * len(x_values),
+                y_step * len(y_values),
+            )
+        )
+        plot.addItem(item)
+        plot.setLabel("left", settings["y_ax"])
+        # Gray scale as the default lookup table of the viewer's image.
+        gray = pg.ColorMap(pos=[0.0, 1.0], color=[(0, 0, 0), (255, 255, 255)])
+        colorbar = pg.ColorBarItem(
+            values=tuple(item.levels), colorMap=gray, interactive=False
+        )
+        colorbar.setImageItem(item, insert_in=plot)
+    else:
+        plot.plot(x_values, image[:, 0], pen=pg.mkPen("k", width=2), symbol="o")
+        plot.setLabel("left", "intensity")
+    app.processEvents()
+    pg.exporters.ImageExporter(plot).export(path)
+    widget.close()
@@ -1,13 +1,25 @@
-from data_reader import read_camels_file, decide_entry_key
-from utils.fit_variable_renaming import replace_name
+try:
+    from .data_reader import read_camels_file, decide_entry_key
+    from .utils.fit_variable_renaming import FitIndex, stored_fit_name
+    from .utils.file_names import safe_file_name, unique_file_stems
+    from .figure_export import write_compact_figure
+except ImportError:
+    # The viewer is also started from within this directory.
+    from data_reader import read_camels_file, decide_entry_key
+    from utils.fit_variable_renaming import FitIndex, stored_fit_name
+    from utils.file_names import safe_file_name, unique_file_stems
+    from figure_export import write_compact_figure
 import h5py
 import json
 import lmfit
 import numpy as np
+import os
 import scipy.constants as const
 import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 import plotly.graph_objects as go
+import plotly.offline
 from plotly.subplots import make_subplots
 
 
@@ -33,7 +45,15 @@ def _recursive_plots_from_sub_protocol_dict(own_name, protocol_info):
 
 
 def recreate_plots(
-    file_path, entry_key: str = "", data_set_key: str = "", show_figures=True
+    file_path,
+    entry_key: str = "",
+    data_set_key: str = "",
+    show_figures=True,
+    refit=False,
+    workers=None,
+    raster_threshold=20000,
+    raster_resolution=(400, 400),
+    raster_reduce="mean",
 ):
     """Recreate plots from a CAMELS file as Plotly figures.
 
@@ -47,12 +67,34 @@ def recreate_plots(
         The dataset key to use for reading the file. If not provided, all datasets will be used.
     show_figures : bool, optional
         If True, the figures will be displayed. Default is True.
+    refit : bool, optional
+        If True, the fits defined in the protocol are performed again on the
+        data of the file, starting from the stored fit parameters. The fits
+        run in parallel processes. Otherwise, the stored parameters are only
+        evaluated. Default is False.
+    workers : int, optional
+        Number of worker processes used for `refit`. If not provided, the
+        number of CPUs is used.
+    raster_threshold : int, optional
+        2D plots whose data cannot be arranged on a regular grid are shown as
+        a scatter plot. Above this number of points, the points are binned
+        into an image instead. Default is 20000.
+    raster_resolution : tuple of int, optional
+        Number of (x, y) bins of the image for many points. Default is (400, 400).
+    raster_reduce : str, optional
+        How the z values inside one bin are combined, "mean", "max" or "count".
+        Default is "mean".
 
 
     Returns
     -------
     dict
         A dictionary containing the recreated figures, keyed by their names.
+        None if the file has no plots.
+    dict
+        Only returned if `refit` is True. The results of the fits keyed by
+        the name of the fit, see `_refit_worker` for the contents. Empty if
+        the file has no plots.
     """
 
     # Open the file and load the measurement protocol JSON.
@@ -69,6 +111,8 @@ def recreate_plots(
             "It might be that no plots were defined for the measurement.\n"
             "Caveat: Plots for subprotocols only work from CAMELS version 1.8.3 onwards."
         )
+        if refit:
+            return None, {}
         return None
     # Load the data from the file using the data_reader.
     if not data_set_key:
@@ -83,7 +127,11 @@ def recreate_plots(
             )
         }
 
+    # The stored fits of all streams, looked up by the plotted fits.
+    fit_index = _fit_index(plot_info, data)
     figures = {}
+    # With refit, the fits are collected first and performed in parallel later.
+    refit_jobs = [] if refit else None
     # Iterate over each stream and its associated plots.
     for stream, plots in plot_info.items():
         if stream not in data:
@@ -138,11 +186,13 @@ def recreate_plots(
                     _make_fit(
                         fit,
                         fit_data,
+                        fit_index,
                         df,
                         plot["y_axes"],
                         stream,
                         fig,
                         is_all_fit=True,
+                        refit_jobs=refit_jobs,
                     )
                 else:
                     for fit in plot["fits"]:
@@ -151,10 +201,12 @@ def recreate_plots(
                         _make_fit(
                             fit,
                             fit_data,
+                            fit_index,
                             df,
                             plot["y_axes"],
                             stream,
                             fig,
+                            refit_jobs=refit_jobs,
                         )
                 figures[plot["name"]] = fig
             elif plot["plt_type"] == "2D plot":
@@ -187,6 +239,28 @@ def recreate_plots(
                             showscale=True,
                         )
                     )
+                elif len(x_data) > raster_threshold:
+                    # Too many points for a scatter plot, bin them into an image.
+                    x_bins, y_bins, image = _rasterize_points(
+                        x_data, y_data, z_data, raster_resolution, raster_reduce
+                    )
+                    fig = go.Figure(
+                        data=go.Heatmap(
+                            x=x_bins,
+                            y=y_bins,
+                            z=image,
+                            colorscale="Viridis",
+                            colorbar=dict(
+                                title=plot["zlabel"]
+                                or (
+                                    "count"
+                                    if raster_reduce == "count"
+                                    else plot["z_axis"]
+                                ),
+                            ),
+                            showscale=True,
+                        )
+                    )
                 else:
                     # Fallback to a scatter plot if colormesh cannot be created.
                     fig = go.Figure(
@@ -212,12 +286,125 @@ def recreate_plots(
                     yaxis_title=plot["ylabel"] or plot["y_axes"]["formula"][0],
                 )
                 figures[plot["name"]] = fig
+    if refit:
+        fit_reports = _run_refits(refit_jobs, workers)
     if show_figures:
         for fig in figures.values():
             fig.show()
+    if refit:
+        return figures, fit_reports
     return figures
 
 
+def recreate_plots_many(
+    paths,
+    out_dir,
+    workers=None,
+    fmt="html",
+    entry_key: str = "",
+    data_set_key: str = "",
+    float32=False,
+):
+    """Recreate the plots of many CAMELS files in parallel and write them to disk.
+
+    Every file is handled by `recreate_plots` (with `show_figures=False`) in a
+    separate worker process. The figures of each file are written to a
+    sub-directory of `out_dir` named after the file, files with the same name
+    get a suffix "_2", "_3", ... in the order of `paths`. For HTML output, a single
+    `plotly.min.js` is written to `out_dir` and referenced by all figures
+    instead of embedding a copy of plotly.js into every file.
+
+    As this function uses multiple processes, scripts calling it on Windows or
+    macOS must be protected by `if __name__ == "__main__":`.
+
+    Parameters
+    ----------
+    paths : list of str
+        Paths to the CAMELS files.
+    out_dir : str
+        Directory to write the figures to. It is created if it does not exist.
+    workers : int, optional
+        Number of worker processes. If not provided, the number of CPUs is used.
+    fmt : str, optional
+        Output format, either "html", "json" or "compact". Default is "html".
+        "compact" writes JSON files with deduplicated typed arrays, see
+        `figure_export.write_compact_figure`.
+    entry_key : str, optional
+        The entry key to use for reading the files.
+    data_set_key : str, optional
+        The dataset key to use for reading the files. If not provided, all datasets will be used.
+    float32 : bool, optional
+        If True, the "compact" format stores floating point data with single precision.
+
+    Returns
+    -------
+    dict
+        A dictionary mapping each input path to the list of written files.
+        Files that could not be processed map to an empty list.
+    """
+    if fmt not in ("html", "json", "compact"):
+        raise ValueError(f'Unknown format "{fmt}", use "html", "json" or "compact".')
+    os.makedirs(out_dir, exist_ok=True)
+    if fmt == "html":
+        # Write the shared plotly.js bundle once for all figures.
+        with open(os.path.join(out_dir, "plotly.min.js"), "w", encoding="utf-8") as f:
+            f.write(plotly.offline.get_plotlyjs())
+    stems = unique_file_stems(paths, "figures")
+    written = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(
+                _recreate_and_write,
+                path,
+                os.path.join(out_dir, stems[path]),
+                fmt,
+                entry_key,
+                data_set_key,
+                float32,
+            ): path
+            for path in paths
+        }
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                written[path] = future.result()
+            except Exception as e:
+                warnings.warn(f"Could not recreate the plots of {path}.\n{e}")
+                written[path] = []
+    return {path: written[path] for path in paths}
+
+
+def _recreate_and_write(
+    file_path, file_dir, fmt, entry_key, data_set_key, float32=False
+):
+    """Worker for `recreate_plots_many`, recreates the plots of one file and
+    writes them into `file_dir`."""
+    figures = recreate_plots(
+        file_path,
+        entry_key=entry_key,
+        data_set_key=data_set_key,
+        show_figures=False,
+    )
+    if not figures:
+        return []
+    os.makedirs(file_dir, exist_ok=True)
+    written = []
+    for name, fig in figures.items():
+        fig_name = safe_file_name(name, "figure")
+        if fmt == "html":
+            fig_path = os.path.join(file_dir, f"{fig_name}.html")
+            # The bundle lives one level above the figures of each file.
+            fig.write_html(fig_path, include_plotlyjs="../plotly.min.js")
+        elif fmt == "compact":
+            fig_path = os.path.join(file_dir, f"{fig_name}.json")
+            write_compact_figure(fig, fig_path, float32=float32)
+        else:
+            fig_path = os.path.join(file_dir, f"{fig_name}.json")
+            fig.write_json(fig_path)
+        written.append(fig_path)
+    return written
+
+
 def _make_colormesh(x_data, y_data, z_data):
     """Create a colormesh (or a heatmap) from x, y and z data.
 
@@ -257,13 +444,120 @@ def _make_colormesh(x_data, y_data, z_data):
         return None
 
 
-def _make_fit(fit_info, fit_data, df, y_axes, stream, figure, is_all_fit=False):
-    if fit_info["use_custom_func"]:
-        func = fit_info["custom_func"]
-        model = lmfit.models.ExpressionModel(func)
+def _rasterize_points(x_data, y_data, z_data, resolution=(400, 400), reduce="mean"):
+    """Bin scattered (x, y) points into an image of fixed resolution.
+
+    Parameters
+    ----------
+    x_data, y_data, z_data : array-like
+        The coordinates and values of the points.
+    resolution : tuple of int, optional
+        Number of bins along x and y. Default is (400, 400).
+    reduce : str, optional
+        How the z values inside one bin are combined, "mean", "max" or "count".
+        Default is "mean".
+
+    Returns
+    -------
+    tuple
+        The centers of the x bins, the centers of the y bins and the image
+        with shape (len(y bins), len(x bins)). Empty bins are NaN.
+    """
+    if reduce not in ("mean", "max", "count"):
+        raise ValueError(f'Unknown reduction "{reduce}", use "mean", "max" or "count".')
+    x = np.asarray(x_data, dtype=float)
+    y = np.asarray(y_data, dtype=float)
+    z = np.asarray(z_data, dtype=float)
+    valid = np.isfinite(x) & np.isfinite(y)
+    if reduce != "count":
+        valid &= np.isfinite(z)
+    x, y, z = x[valid], y[valid], z[valid]
+    nx, ny = resolution
+    centers = []
+    indices = []
+    for values, n in ((x, nx), (y, ny)):
+        lo, hi = (values.min(), values.max()) if values.size else (0.0, 1.0)
+        width = (hi - lo) / n or 1.0
+        centers.append(lo + (np.arange(n) + 0.5) * width)
+        indices.append(np.clip(((values - lo) / width).astype(np.intp), 0, n - 1))
+    flat = indices[1] * nx + indices[0]
+    counts = np.bincount(flat, minlength=nx * ny).astype(float)
+    if reduce == "count":
+        image = counts
+    elif reduce == "mean":
+        with np.errstate(invalid="ignore", divide="ignore"):
+            image = np.bincount(flat, weights=z, minlength=nx * ny) / counts
     else:
-        func = fit_info["predef_func"]
-        model = lmfit.models.lmfit_models[func]()
+        image = np.full(nx * ny, -np.inf)
+        np.maximum.at(image, flat, z)
+    image[counts == 0] = np.nan
+    return centers[0], centers[1], image.reshape(ny, nx)
+
+
+def _fit_index(plot_info, data):
+    """Index the stored fits of all streams with the names of the plotted fits.
+
+    Parameters
+    ----------
+    plot_info : dict
+        The plots of every stream, see `_recursive_plots_from_sub_protocol_dict`.
+    data : dict
+        The data and fit data of every stream, as read by `read_camels_file`.
+
+    Returns
+    -------
+    FitIndex
+        All stored fits, the fits of the X-Y plots keyed by their original
+        names.
+    """
+    index = FitIndex({stream: data[stream][1] for stream in data})
+    for stream, plots in plot_info.items():
+        if stream not in data:
+            continue
+        for plot in plots:
+            if plot["plt_type"] != "X-Y plot":
+                continue
+            if plot["same_fit"] and plot["all_fit"]["do_fit"]:
+                fits = [(plot["all_fit"], plot["y_axes"]["formula"])]
+            else:
+                fits = [(fit, [fit["y"]]) for fit in plot["fits"] if fit["do_fit"]]
+            for fit_info, ys in fits:
+                func = _fit_function(fit_info)
+                for y in ys:
+                    index.add(func, y, fit_info["x"], stream)
+    return index
+
+
+def _fit_function(fit_info):
+    """The custom expression or the name of the predefined model of a fit."""
+    if fit_info["use_custom_func"]:
+        return fit_info["custom_func"]
+    return fit_info["predef_func"]
+
+
+def _make_fit(
+    fit_info,
+    fit_data,
+    fit_index,
+    df,
+    y_axes,
+    stream,
+    figure,
+    is_all_fit=False,
+    refit_jobs=None,
+):
+    if refit_jobs is not None:
+        # Only collect the fits here, they are performed by `_run_refits`.
+        ys = y_axes["formula"] if is_all_fit else [fit_info["y"]]
+        for y in ys:
+            y_axis = y_axes["axis"][y_axes["formula"].index(y)]
+            _collect_refit_job(
+                fit_info, y, stream, df, fit_data, fit_index, y_axis, figure, refit_jobs
+            )
+        return
+    use_custom_func = fit_info["use_custom_func"]
+    func = _fit_function(fit_info)
+    model = _make_model(use_custom_func, func)
     params = model.make_params()
     if is_all_fit:
         for i, y in enumerate(y_axes["formula"]):
@@ -276,6 +570,7 @@ def _make_fit(fit_info, fit_data, df, y_axes, stream, figure, is_all_fit=False):
                 model,
                 df,
                 fit_data,
+                fit_index,
                 y_axes["axis"][i],
                 figure,
             )
@@ -290,15 +585,23 @@ def _make_fit(fit_info, fit_data, df, y_axes, stream, figure, is_all_fit=False):
             model,
             df,
             fit_data,
+            fit_index,
             y_axis,
             figure,
         )
 
 
-def _make_single_fit(func, y, x, stream, params, model, df, fit_data, y_axis, figure):
+def _make_single_fit(
+    func, y, x, stream, params, model, df, fit_data, fit_index, y_axis, figure
+):
+    fit_name = fit_index.get(func, y, x, stream)
+    if fit_name is None:
+        warnings.warn(
+            f"The parameters of the fit {func} for {y} vs {x} are not stored "
+            f'in the stream "{stream}".'
+        )
+        return
     try:
-        fit_name = "_".join((func, y, "v", x, stream))
-        fit_name = replace_name(fit_name)
         for param in params:
             params[param].set(value=fit_data[fit_name][param])
         if x in df:
@@ -325,6 +628,125 @@ def _make_single_fit(func, y, x, stream, params, model, df, fit_data, y_axis, fi
         )
 
 
+def _make_model(use_custom_func, func):
+    if use_custom_func:
+        return lmfit.models.ExpressionModel(func)
+    return lmfit.models.lmfit_models[func]()
+
+
+def _collect_refit_job(
+    fit_info, y, stream, df, fit_data, fit_index, y_axis, figure, jobs
+):
+    """Gather everything needed to perform one fit in a worker process."""
+    use_custom_func = fit_info["use_custom_func"]
+    func = _fit_function(fit_info)
+    x = fit_info["x"]
+    fit_name = fit_index.get(func, y, x, stream)
+    if fit_name is None:
+        # No stored start values, the fit is still performed.
+        fit_name = stored_fit_name(func, y, x, stream)
+    try:
+        x_data = np.asarray(df[x] if x in df else _evaluate_string(x, df), dtype=float)
+        y_data = np.asarray(df[y] if y in df else _evaluate_string(y, df), dtype=float)
+    except Exception as e:
+        warnings.warn(f"Could not get the data for the fit {func} for {y} vs {x}.\n{e}")
+        return
+    start_values = {}
+    if fit_name in fit_data:
+        for param in fit_data[fit_name].keys():
+            try:
+                # Use the last stored value if the fit was done several times.
+                start_values[param] = float(np.ravel(fit_data[fit_name][param])[-1])
+            except (TypeError, ValueError, IndexError):
+                continue
+    jobs.append(
+        {
+            "fit_name": fit_name,
+            "figure": figure,
+            "y_axis": y_axis,
+            "args": (use_custom_func, func, x_data, y_data, start_values),
+        }
+    )
+
+
+def _run_refits(jobs, workers=None):
+    """Perform the collected fits in a process pool and add their curves to
+    the figures.
+
+    Returns
+    -------
+    dict
+        The results of `_refit_worker` keyed by the name of the fit.
+    """
+    fit_reports = {}
+    if not jobs:
+        return fit_reports
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_refit_worker, *job["args"]) for job in jobs]
+        for job, future in zip(jobs, futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                warnings.warn(f"Could not perform the fit {job['fit_name']}.\n{e}")
+                continue
+            fit_reports[job["fit_name"]] = result
+            job["figure"].add_trace(
+                go.Scatter(
+                    x=result["x"],
+                    y=result["y"],
+                    mode="lines",
+                    name=job["fit_name"],
+                    line=dict(dash="dash"),
+                ),
+                secondary_y=job["y_axis"] == "right",
+            )
+    return fit_reports
+
+
+def _refit_worker(use_custom_func, func, x_data, y_data, start_values):
+    """Fit the model to the data, starting from the given parameter values.
+
+    Returns
+    -------
+    dict
+        "report": the lmfit fit report,
+        "params": the best-fit values,
+        "stderr": the standard errors of the parameters,
+        "success": whether the fit converged,
+        "redchi": the reduced chi-square,
+        "x", "y": the evaluated fit curve.
+    """
+    model = _make_model(use_custom_func, func)
+    valid = np.isfinite(x_data) & np.isfinite(y_data)
+    x_data = x_data[valid]
+    y_data = y_data[valid]
+    if start_values.keys() >= set(model.param_names):
+        params = model.make_params()
+    else:
+        try:
+            params = model.guess(y_data, x=x_data)
+        except NotImplementedError:
+            params = model.make_params()
+    # Derived parameters (e.g. fwhm, height) are recomputed by lmfit, setting
+    # their value would remove their expression.
+    for param in model.param_names:
+        if param in start_values and params[param].expr is None:
+            params[param].set(value=start_values[param])
+    result = model.fit(y_data, params, x=x_data)
+    x_eval = x_data
+    if len(x_eval) < 100:
+        x_eval = np.linspace(x_eval.min(), x_eval.max(), 100)
+    return {
+        "report": result.fit_report(),
+        "params": {name: par.value for name, par in result.params.items()},
+        "stderr": {name: par.stderr for name, par in result.params.items()},
+        "success": result.success,
+        "redchi": result.redchi,
+        "x": x_eval,
+        "y": result.eval(x=x_eval),
+    }
+
+
 # Create a base namespace with common modules and constants
 base_namespace = {"numpy": np, "np": np, "time": 0, "const": const}
 # Add all numpy functions to the base namespace
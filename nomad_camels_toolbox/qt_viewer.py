@@ -7,7 +7,11 @@ data handling. The viewer supports drag-and-drop file loading, multiple plot typ
 and interactive image/intensity analysis.
 """
 
+import json
+import os
 import sys
+import time
+from contextlib import contextmanager
 from importlib import resources
 
 import PySide6
@@ -15,14 +19,19 @@ from PySide6 import QtWidgets, QtCore, QtGui
 from PySide6.QtCore import Qt
 import h5py
 import numpy as np
-import copy
 
 import pyqtgraph as pg
 
 from utils.exception_hook import exception_hook
 import graphics
 
-from data_reader import read_camels_file, PANDAS_INSTALLED
+from data_reader import (
+    read_camels_file,
+    LazyDataSet,
+    MemoryManager,
+    PANDAS_INSTALLED,
+)
+from intensity_map import SpectrumCube, prepare_intensity_map
 
 # these are the colors used by matplotlib, they are used as default colors in light mode
 matplotlib_default_colors = {
@@ -70,6 +79,13 @@ linestyles = {
     "none": Qt.PenStyle.NoPen,
 }
 
+# Colors of the groups of curves when all spectra are overlaid.
+overlay_colors = pg.colormap.get("viridis").map(np.linspace(0, 1, 16), mode="qcolor")
+
+# Identification of the session files of the viewer.
+SESSION_FORMAT_NAME = "camels-viewer-session"
+SESSION_FORMAT_VERSION = 1
+
 # Define dark theme palette settings.
 dark_palette = QtGui.QPalette()
 dark_palette.setColor(QtGui.QPalette.Window, QtGui.QColor(53, 53, 53))
@@ -129,6 +145,16 @@ class DragDropGraphicLayoutWidget(pg.GraphicsLayoutWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setAcceptDrops(True)
+        # Duration of the last repaint in seconds.
+        self.frame_time = 0.0
+
+    def paintEvent(self, event):
+        """
+        Paint the plots and measure how long it takes.
+        """
+        start = time.perf_counter()
+        super().paintEvent(event)
+        self.frame_time = time.perf_counter() - start
 
     def dragEnterEvent(self, event):
         """
@@ -213,12 +239,11 @@ class CAMELS_Viewer(QtWidgets.QMainWindow):
             [1, 1],
             movable=True,
             translateSnap=True,
+            scaleSnap=True,
             maxBounds=None,
             parent=self.image_plot,
             pen=pen,
         )
-        # Remove extra handle from the ROI.
-        self.image_ROI.removeHandle(self.image_ROI.getHandles()[-1])
         self.image_plot.addItem(self.image_ROI)
         self.image_ROI.sigRegionChanged.connect(self._image_roi_moved)
 
@@ -252,28 +277,42 @@ class CAMELS_Viewer(QtWidgets.QMainWindow):
         self.load_measurement_button = QtWidgets.QPushButton("Load Measurement")
         self.load_measurement_button.clicked.connect(self.load_measurement)
 
+        # Buttons to save the state of the viewer and to restore it.
+        self.save_session_button = QtWidgets.QPushButton("Save Session")
+        self.save_session_button.setToolTip(
+            "Save the loaded files, selections and computed images to a file."
+        )
+        self.save_session_button.clicked.connect(self.save_session_dialog)
+        self.load_session_button = QtWidgets.QPushButton("Load Session")
+        self.load_session_button.clicked.connect(self.load_session_dialog)
+
         self.dark_mode_box = QtWidgets.QCheckBox("Dark Mode")
         self.dark_mode_box.setChecked(False)
         self.dark_mode_box.stateChanged.connect(self._dark_mode_toggle)
 
-        # Create a table widget to list and manage multiple plots.
-        self.plot_table = QtWidgets.QTableWidget()
-        labels = [
-            "plot?",
-            "X",
-            "Y",
-            "data-set",
-            "color",
-            "symbol",
-            "linestyle",
-            "file",
-            "file-entry",
-        ]
-        self.plot_table.setColumnCount(len(labels))
-        self.plot_table.setHorizontalHeaderLabels(labels)
+        # Create a table to list and manage multiple plots. The selections are
+        # stored in a model, combo boxes only exist while a cell is edited.
+        self.plot_model = PlotTableModel(
+            lambda row: self.data[self._data_key(row)], parent=self
+        )
+        self.plot_table = QtWidgets.QTableView()
+        self.plot_table.setModel(self.plot_model)
+        self.plot_table.setItemDelegate(ComboBoxDelegate(self.plot_table))
+        self.plot_table.setEditTriggers(
+            QtWidgets.QAbstractItemView.CurrentChanged
+            | QtWidgets.QAbstractItemView.SelectedClicked
+            | QtWidgets.QAbstractItemView.DoubleClicked
+        )
         self.plot_table.verticalHeader().hide()
         self.plot_table.resizeColumnsToContents()
         self.plot_table.clicked.connect(self.check_change)
+        self.plot_model.dataChanged.connect(self._plot_table_changed)
+        # Files loaded shortly after each other are added to the table at once.
+        self._pending_rows = []
+        self.add_rows_timer = QtCore.QTimer(self)
+        self.add_rows_timer.setSingleShot(True)
+        self.add_rows_timer.setInterval(50)
+        self.add_rows_timer.timeout.connect(self._add_pending_rows)
 
         # Widget for multi-selection options for images and filters.
         self.multi_selection_widget = QtWidgets.QWidget()
@@ -288,12 +327,116 @@ class CAMELS_Viewer(QtWidgets.QMainWindow):
         self.last_x = 0
         self.last_y = 0
 
+        # Settings for plotting large 1D data, applied to every row of the table.
+        self.performance_box = QtWidgets.QGroupBox("Performance")
+        self.downsample_box = QtWidgets.QCheckBox("downsample (peak)")
+        self.downsample_box.setChecked(True)
+        self.clip_to_view_box = QtWidgets.QCheckBox("clip to view")
+        self.clip_to_view_box.setChecked(True)
+        self.symbol_limit_box = QtWidgets.QSpinBox()
+        self.symbol_limit_box.setRange(0, 100_000_000)
+        self.symbol_limit_box.setSingleStep(1000)
+        self.symbol_limit_box.setValue(10000)
+        self.symbol_limit_box.setToolTip(
+            "Symbols are not drawn for curves with more points than this."
+        )
+        self.opengl_box = QtWidgets.QCheckBox("OpenGL")
+        self.opengl_box.setToolTip("Use OpenGL to render the plots, needs PyOpenGL.")
+        performance_layout = QtWidgets.QGridLayout()
+        self.performance_box.setLayout(performance_layout)
+        performance_layout.addWidget(self.downsample_box, 0, 0)
+        performance_layout.addWidget(self.clip_to_view_box, 0, 1)
+        performance_layout.addWidget(QtWidgets.QLabel("max. points with symbols:"), 1, 0)
+        performance_layout.addWidget(self.symbol_limit_box, 1, 1)
+        performance_layout.addWidget(self.opengl_box, 2, 0)
+        # Budget for the data read from the files, unused columns are unloaded.
+        self.memory_budget_box = QtWidgets.QSpinBox()
+        self.memory_budget_box.setRange(16, 1_000_000)
+        self.memory_budget_box.setSingleStep(256)
+        self.memory_budget_box.setSuffix(" MB")
+        self.memory_budget_box.setValue(2048)
+        self.memory_budget_box.setToolTip(
+            "Data that is not plotted is unloaded when the loaded data exceeds this "
+            "budget. It is read again from the file when needed."
+        )
+        performance_layout.addWidget(QtWidgets.QLabel("memory budget:"), 3, 0)
+        performance_layout.addWidget(self.memory_budget_box, 3, 1)
+        # Timings of loading, computing and drawing, to find slow stages.
+        self.performance_info_box = QtWidgets.QCheckBox("show performance info")
+        self.performance_info_box.stateChanged.connect(self._update_performance_info)
+        performance_layout.addWidget(self.performance_info_box, 4, 0, 1, 2)
+        self.performance_info = QtWidgets.QLabel()
+        self.performance_info.setFont(
+            QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.FixedFont)
+        )
+        self.performance_info.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        self.performance_info.hide()
+        performance_layout.addWidget(self.performance_info, 5, 0, 1, 2)
+        self.downsample_box.stateChanged.connect(self._apply_plot_settings_to_all)
+        self.clip_to_view_box.stateChanged.connect(self._apply_plot_settings_to_all)
+        self.symbol_limit_box.valueChanged.connect(self._apply_plot_settings_to_all)
+        self.opengl_box.stateChanged.connect(self._opengl_toggle)
+        self.memory_budget_box.valueChanged.connect(self._memory_budget_changed)
+
+        # Progress of files that are loaded in the background.
+        self.load_progress = QtWidgets.QProgressBar()
+        self.load_progress.setFormat("loaded %v of %m files")
+        self.load_progress.hide()
+        self.cancel_loading_button = QtWidgets.QPushButton("Cancel Loading")
+        self.cancel_loading_button.clicked.connect(self.cancel_loading)
+        self.cancel_loading_button.hide()
+
+        # Follow files that are still written, e.g. by a running measurement.
+        self.follow_box = QtWidgets.QCheckBox("follow live files")
+        self.follow_box.setToolTip(
+            "Watch the loaded files and show data that is appended to them."
+        )
+        self.follow_box.stateChanged.connect(self._follow_toggle)
+
+        # Reduction of the spectra inside the image ROI.
+        self.roi_reduce_box = QtWidgets.QComboBox()
+        self.roi_reduce_box.addItems(["mean", "sum", "max"])
+        self.roi_reduce_box.setToolTip(
+            "How the spectra of the pixels inside the ROI are combined."
+        )
+        self.roi_reduce_box.currentTextChanged.connect(self._roi_reduce_changed)
+
+        # Overlay of all spectra of an image, drawn with a few curve items.
+        self.overlay_box = QtWidgets.QGroupBox("overlay all spectra")
+        self.overlay_box.setCheckable(True)
+        self.overlay_box.setChecked(False)
+        self.overlay_offset_box = QtWidgets.QDoubleSpinBox()
+        self.overlay_offset_box.setRange(-1e12, 1e12)
+        self.overlay_offset_box.setDecimals(4)
+        self.overlay_offset_box.setToolTip(
+            "Shift of every spectrum relative to the previous one (waterfall)."
+        )
+        self.overlay_colors_box = QtWidgets.QCheckBox("color by position")
+        self.overlay_colors_box.setChecked(True)
+        overlay_layout = QtWidgets.QGridLayout()
+        self.overlay_box.setLayout(overlay_layout)
+        overlay_layout.addWidget(QtWidgets.QLabel("offset:"), 0, 0)
+        overlay_layout.addWidget(self.overlay_offset_box, 0, 1)
+        overlay_layout.addWidget(self.overlay_colors_box, 1, 0, 1, 2)
+        self.overlay_box.toggled.connect(self._overlay_settings_changed)
+        self.overlay_offset_box.valueChanged.connect(self._overlay_settings_changed)
+        self.overlay_colors_box.stateChanged.connect(self._overlay_settings_changed)
+
         # Add widgets to the left-side layout.
         layout.addWidget(self.load_measurement_button, 0, 0)
         layout.addWidget(self.dark_mode_box, 0, 1)
         layout.addWidget(self.plot_table, 1, 0, 1, 2)
         layout.addWidget(self.image_xlabel, 2, 0)
         layout.addWidget(self.image_ylabel, 2, 1)
+        layout.addWidget(self.load_progress, 3, 0)
+        layout.addWidget(self.cancel_loading_button, 3, 1)
+        layout.addWidget(self.performance_box, 4, 0, 1, 2)
+        layout.addWidget(self.follow_box, 5, 0)
+        layout.addWidget(self.overlay_box, 6, 0, 1, 2)
+        layout.addWidget(QtWidgets.QLabel("ROI spectrum:"), 7, 0)
+        layout.addWidget(self.roi_reduce_box, 7, 1)
+        layout.addWidget(self.save_session_button, 8, 0)
+        layout.addWidget(self.load_session_button, 8, 1)
         layout.addWidget(self.multi_selection_widget, 10, 0, 1, 2)
         self.options_layout = layout
 
@@ -301,6 +444,52 @@ class CAMELS_Viewer(QtWidgets.QMainWindow):
         self.data = {}
         self.plot_items = []
         self.image_data = None
+        # Grid index and cumulative integrals of the current image selection.
+        self.image_index = None
+        self._integrator = None
+        self._spectrum_cube = None
+        self._image_selection = None
+
+        # Files are read by worker threads, the results are added on the GUI thread.
+        self.load_pool = QtCore.QThreadPool()
+
+        # Heavy computations of interactions run debounced in the background.
+        self.recompute_scheduler = RecomputeScheduler(self)
+        self._full_image_update = False
+        self.overlay_items = []
+
+        # Accounting of the memory of loaded columns, shown in the status bar.
+        self._columns_in_use = []
+        self._image_columns_in_use = []
+        self.memory_manager = MemoryManager(
+            self.memory_budget_box.value() * 1024**2,
+            in_use=lambda: self._columns_in_use,
+        )
+        self.memory_label = QtWidgets.QLabel()
+        self.statusBar().addPermanentWidget(self.memory_label)
+        self.memory_timer = QtCore.QTimer(self)
+        self.memory_timer.timeout.connect(self._update_memory_label)
+        self.memory_timer.timeout.connect(self._update_performance_info)
+        # Durations of stages on the GUI thread and of loading the files.
+        self.timings = {}
+        self.load_times = {}
+        self.memory_timer.start(1000)
+        self._loading_files = []
+        self._load_generation = 0
+        # A session that is restored once its files are loaded, the stored
+        # grid index of its image and the position of its ROI.
+        self._session = None
+        self._session_index = None
+        self._session_roi = None
+
+        # Keys in `self.data` of every loaded file, for following the files.
+        self._file_data_keys = {}
+        self.file_watcher = QtCore.QFileSystemWatcher(self)
+        self.file_watcher.fileChanged.connect(self._refresh_file)
+        # Not every file system reports changes, so the files are also polled.
+        self.follow_timer = QtCore.QTimer(self)
+        self.follow_timer.setInterval(2000)
+        self.follow_timer.timeout.connect(self._refresh_followed_files)
 
         self.showMaximized()
 
@@ -341,16 +530,32 @@ class CAMELS_Viewer(QtWidgets.QMainWindow):
 
     def check_change(self, index):
         """
-        Handler for clicks on the plot table. Updates the plot based on changes.
+        Handler for clicks on the plot table. Shows the selections of the row.
+
+        Changes of the values are handled by `_plot_table_changed`.
 
         Parameters:
             index (QModelIndex): Index of the cell clicked.
         """
-        c = index.column()
-        if c == 0:  # If the checkbox column was clicked.
-            self._add_or_change_plot_data(index.row())
         self.make_multi_selection_widget(index.row())
 
+    def _plot_table_changed(self, top_left, bottom_right, roles=()):
+        """
+        Update the plots of the table rows whose values changed.
+
+        Parameters:
+            top_left (QModelIndex): First changed cell.
+            bottom_right (QModelIndex): Last changed cell.
+            roles (list): The changed roles.
+        """
+        columns = range(top_left.column(), bottom_right.column() + 1)
+        for row in range(top_left.row(), bottom_right.row() + 1):
+            if PlotTableModel.columns.index("data-set") in columns:
+                self._update_x_y_selection(row)
+            else:
+                with self._timed("plot update"):
+                    self._add_or_change_plot_data(row)
+
     def make_multi_selection_widget(self, number):
         """
         Create and display the multi-selection widget to set image axis selections
@@ -359,8 +564,8 @@ class CAMELS_Viewer(QtWidgets.QMainWindow):
         Parameters:
             number (int): Row index from the plot table for which to configure the widget.
         """
-        x_selection = self.plot_table.cellWidget(number, 1).currentText()
-        y_selection = self.plot_table.cellWidget(number, 2).currentText()
+        x_selection = self.plot_model.value(number, "X")
+        y_selection = self.plot_model.value(number, "Y")
         data = self._get_current_data(number)
         widget = Multi_Selection_Widget(
             data, x_selection=x_selection, y_selection=y_selection
@@ -389,89 +594,69 @@ class CAMELS_Viewer(QtWidgets.QMainWindow):
             fname (str): File name of the loaded data.
             entry_name (str): Specific entry name within the file.
         """
-        row = self.plot_table.rowCount()
-        self.plot_table.setRowCount(row + 1)
-
-        # Create a checkable item to enable/disable plotting.
-        self.plot_table.setItem(row, 0, QtWidgets.QTableWidgetItem())
-        self.plot_table.item(row, 0).setFlags(Qt.ItemIsUserCheckable | Qt.ItemIsEnabled)
-        self.plot_table.item(row, 0).setCheckState(Qt.Checked)
-
-        # Create combo boxes for data-set and axis selections.
-        data_sets = list(data.keys())
-        box1 = QtWidgets.QComboBox()
-        box1.addItems(data_sets)
-        self.plot_table.setCellWidget(row, 3, box1)
+        self.add_table_rows([(data, fname, entry_name)])
 
-        box2 = QtWidgets.QComboBox()
-        self.plot_table.setCellWidget(row, 1, box2)
-        box3 = QtWidgets.QComboBox()
-        self.plot_table.setCellWidget(row, 2, box3)
-
-        # Create combo boxes for color, symbol, and linestyle.
-        box4 = QtWidgets.QComboBox()
-        box4.addItems(list(matplotlib_default_colors.keys()))
-        box4.setCurrentIndex(row % len(matplotlib_default_colors))
-        self.plot_table.setCellWidget(row, 4, box4)
-
-        box5 = QtWidgets.QComboBox()
-        box5.addItems(list(symbols.keys()))
-        box5.setCurrentText("none")
-        self.plot_table.setCellWidget(row, 5, box5)
+    def add_table_rows(self, rows):
+        """
+        Add several rows to the plot table at once.
 
-        box6 = QtWidgets.QComboBox()
-        box6.addItems(list(linestyles.keys()))
-        self.plot_table.setCellWidget(row, 6, box6)
+        Parameters:
+            rows (list): (data, fname, entry_name) for every row, see `add_table_row`.
+        """
+        first = self.plot_model.rowCount()
+        new_rows = []
+        for i, (data, fname, entry_name) in enumerate(rows):
+            data_set = next(iter(data))
+            first_key = next(iter(data[data_set]), "")
+            new_rows.append(
+                {
+                    "plot?": True,
+                    "X": first_key,
+                    "Y": first_key,
+                    "data-set": data_set,
+                    "color": list(matplotlib_default_colors)[
+                        (first + i) % len(matplotlib_default_colors)
+                    ],
+                    "symbol": "none",
+                    "linestyle": next(iter(linestyles)),
+                    "file": fname,
+                    "file-entry": entry_name,
+                }
+            )
+        self._insert_rows(new_rows)
 
-        # Display file name and entry information.
-        self.plot_table.setItem(row, 7, QtWidgets.QTableWidgetItem(fname))
-        self.plot_table.setItem(row, 8, QtWidgets.QTableWidgetItem(entry_name))
+    def _insert_rows(self, new_rows):
+        """
+        Append complete rows to the plot table and plot them.
 
-        self.plot_table.resizeColumnsToContents()
+        Parameters:
+            new_rows (list): A dictionary with a value for every column per row.
+        """
+        first = self.plot_model.rowCount()
+        with self._timed("add rows"):
+            self.plot_model.add_rows(new_rows)
+            self.plot_table.resizeColumnsToContents()
+            for row in range(first, first + len(new_rows)):
+                self._add_or_change_plot_data(row, auto_range=False)
+            self.xy_plot.autoRange()
 
-        self._update_x_y_comboboxes(row)
-        # Connect changes in combo boxes to update the plot.
-        box1.currentTextChanged.connect(
-            lambda text=None, x=row: self._update_x_y_comboboxes(x)
-        )
-        box2.currentTextChanged.connect(
-            lambda text=None, x=row: self._add_or_change_plot_data(x)
-        )
-        box3.currentTextChanged.connect(
-            lambda text=None, x=row: self._add_or_change_plot_data(x)
-        )
-        box4.currentTextChanged.connect(
-            lambda text=None, x=row: self._add_or_change_plot_data(x)
-        )
-        box5.currentTextChanged.connect(
-            lambda text=None, x=row: self._add_or_change_plot_data(x)
-        )
-        box6.currentTextChanged.connect(
-            lambda text=None, x=row: self._add_or_change_plot_data(x)
-        )
+    def _add_pending_rows(self):
+        """
+        Add the rows of the files that were loaded since the last call.
+        """
+        rows, self._pending_rows = self._pending_rows, []
+        if rows:
+            self.add_table_rows(rows)
 
-    def _update_x_y_comboboxes(self, row):
+    def _update_x_y_selection(self, row):
         """
-        Update the X and Y axis combo boxes based on the selected dataset.
+        Select the first data for X and Y after the data set of a row changed.
 
         Parameters:
             row (int): The row in the plot table to update.
         """
-        fname = self.plot_table.item(row, 7).text()
-        entry_name = self.plot_table.item(row, 8).text()
-        data = self.data[f"{fname}_{entry_name}"]
-        data_set_name = self.plot_table.cellWidget(row, 3).currentText()
-        data_set = data[data_set_name]
-        data_keys = list(data_set.keys())
-        # Update X axis combo box.
-        box = self.plot_table.cellWidget(row, 1)
-        box.clear()
-        box.addItems(data_keys)
-        # Update Y axis combo box.
-        box = self.plot_table.cellWidget(row, 2)
-        box.clear()
-        box.addItems(data_keys)
-        self._add_or_change_plot_data(row)
+        first_key = next(iter(self._get_current_data(row)), "")
+        self.plot_model.set_values(row, {"X": first_key, "Y": first_key})
 
     def load_measurement(self):
         """
@@ -487,9 +672,16 @@ class CAMELS_Viewer(QtWidgets.QMainWindow):
         """
         Load data from each given file path.
 
+        The entries of the files are selected on the GUI thread, the files are
+        then read concurrently in the background. A table row is added as soon
+        as a file is loaded.
+
         Parameters:
             file_paths (list): List of paths to HDF5/NeXus files.
         """
+        if not self._loading_files:
+            self.load_progress.setRange(0, 0)
+            self.load_progress.setValue(0)
         for file_path in file_paths:
             # Open the HDF5 file.
             with h5py.File(file_path, "r") as f:
@@ -506,12 +698,410 @@ class CAMELS_Viewer(QtWidgets.QMainWindow):
                         key = remaining_keys[0]
                 else:
                     key = keys[0]
-            # Read the CAMELS file data.
-            data = read_camels_file(
-                file_path, entry_key=key, read_all_datasets=True, return_dataframe=False
+            self._start_loader(file_path, key)
+        self._update_load_progress()
+
+    def _start_loader(self, file_path, key):
+        """
+        Read an entry of a CAMELS file in the background.
+
+        Parameters:
+            file_path (str): Path of the file.
+            key (str): The entry of the file.
+        """
+        loader = FileLoader(file_path, key, self._load_generation)
+        loader.signals.loaded.connect(self._file_loaded)
+        loader.signals.failed.connect(self._file_failed)
+        self._loading_files.append(file_path)
+        self.load_progress.setMaximum(self.load_progress.maximum() + 1)
+        self.load_pool.start(loader)
+
+    def _file_loaded(self, loader, data):
+        """
+        Add the data of a file that was loaded in the background to the table.
+        """
+        if not self._finish_loader(loader):
+            return
+        file_path = loader.file_path
+        key = loader.entry_key
+        for data_set in data.values():
+            data_set.memory_manager = self.memory_manager
+        self.load_times[file_path] = loader.duration
+        self.data[f"{file_path}_{key}"] = data
+        data_keys = self._file_data_keys.setdefault(file_path, [])
+        if f"{file_path}_{key}" not in data_keys:
+            data_keys.append(f"{file_path}_{key}")
+        if self.follow_box.isChecked():
+            self.file_watcher.addPath(file_path)
+        # Cached computations may belong to a previous version of the file.
+        self._image_selection = None
+        if self._session is not None:
+            # The rows are made from the session once all files are loaded.
+            if not self._loading_files:
+                self._apply_session()
+            return
+        self._pending_rows.append((data, file_path, key))
+        if not self.add_rows_timer.isActive():
+            self.add_rows_timer.start()
+
+    def _file_failed(self, loader, exception):
+        """
+        Report a file that could not be loaded in the background.
+        """
+        if not self._finish_loader(loader):
+            return
+        exception_hook(type(exception), exception, exception.__traceback__)
+        if self._session is not None and not self._loading_files:
+            self._apply_session()
+
+    def _finish_loader(self, loader):
+        """
+        Bookkeeping when a background loader is done.
+
+        Returns:
+            bool: False if the loading was cancelled and the result should be dropped.
+        """
+        if loader.generation != self._load_generation:
+            return False
+        self._loading_files.remove(loader.file_path)
+        self.load_progress.setValue(self.load_progress.value() + 1)
+        self._update_load_progress()
+        return True
+
+    def _update_load_progress(self):
+        """
+        Show the progress of the background loading in the status bar.
+        """
+        if self._loading_files:
+            self.load_progress.show()
+            self.cancel_loading_button.show()
+            self.statusBar().showMessage(
+                f"loading {len(self._loading_files)} file(s): "
+                + ", ".join(self._loading_files)
+            )
+        else:
+            self.load_progress.hide()
+            self.cancel_loading_button.hide()
+            self.load_progress.setRange(0, 0)
+            self.statusBar().clearMessage()
+
+    def cancel_loading(self):
+        """
+        Cancel loading of all files that are not finished yet.
+
+        Files that are not started are removed from the queue, the results of
+        files that are currently read are discarded.
+        """
+        self.load_pool.clear()
+        self._load_generation += 1
+        self._loading_files.clear()
+        self._session = None
+        self._update_load_progress()
+
+    def save_session_dialog(self):
+        """
+        Open a file dialog to select a file and save the session to it.
+        """
+        file_path, _ = QtWidgets.QFileDialog.getSaveFileName(
+            self, "Save Session", "", "Viewer session (*.h5)"
+        )
+        if file_path:
+            self.save_session(file_path)
+
+    def load_session_dialog(self):
+        """
+        Open a file dialog to select a session file and restore it.
+        """
+        file_path, _ = QtWidgets.QFileDialog.getOpenFileName(
+            self, "Load Session", "", "Viewer session (*.h5)"
+        )
+        if file_path:
+            self.load_session(file_path)
+
+    def save_session(self, file_path):
+        """
+        Save the state of the viewer to a session file.
+
+        The file stores the rows of the plot table, the settings, the image
+        axes, filters, integration range and ROI, together with the
+        modification times of the loaded files. The derived arrays of the
+        image (the sorted points, their grid indices and the intensities)
+        are stored as well, they are used again if the file did not change.
+
+        Parameters:
+            file_path (str): Path of the session file, an HDF5 file.
+        """
+        rows = [
+            {column: self.plot_model.value(row, column) for column in PlotTableModel.columns}
+            for row in range(self.plot_model.rowCount())
+        ]
+        state = {
+            "files": {row["file"]: _file_stamp(row["file"]) for row in rows},
+            "rows": rows,
+            "settings": {
+                name: _widget_value(widget)
+                for name, widget in self._session_widgets().items()
+            },
+            "image": None,
+        }
+        arrays = {}
+        number = getattr(self, "_current_image_number", None)
+        if (
+            self._image_selection is not None
+            and self.image_plot.isVisible()
+            and number is not None
+            and number < len(rows)
+            and self._image_selection[0] == self._data_key(number)
+        ):
+            state["image"] = {
+                "row": number,
+                "selection": self._image_selection,
+                "lo": self.intensity_line_lo.value(),
+                "hi": self.intensity_line_hi.value(),
+                "roi": [
+                    [float(val) for val in self.image_ROI.pos()],
+                    [float(val) for val in self.image_ROI.size()],
+                ],
+            }
+            arrays = dict(self.image_index, intensities=self.image_data)
+        with h5py.File(file_path, "w") as f:
+            f.attrs["format"] = SESSION_FORMAT_NAME
+            f.attrs["version"] = SESSION_FORMAT_VERSION
+            f.attrs["state"] = json.dumps(state)
+            # Axes of strings cannot be stored, they are computed again.
+            if arrays and all(arr.dtype.kind in "biuf" for arr in arrays.values()):
+                group = f.create_group("image")
+                for key, arr in arrays.items():
+                    group[key] = arr
+        self.statusBar().showMessage(f"Saved session to {file_path}", 5000)
+
+    def load_session(self, file_path):
+        """
+        Restore a session saved by `save_session`.
+
+        Loading of other files is cancelled. The files of the session are
+        loaded in the background, then the rows of the table and the image
+        are restored. The stored derived arrays of the image are only used if
+        the modification time and size of its file did not change, they are
+        shown immediately and the sorting of the points is skipped.
+
+        Parameters:
+            file_path (str): Path of the session file.
+        """
+        with h5py.File(file_path, "r") as f:
+            if f.attrs.get("format") != SESSION_FORMAT_NAME:
+                raise ValueError(f"{file_path} is not a session of the viewer.")
+            state = json.loads(f.attrs["state"])
+            image = state["image"]
+            if image is not None and "image" in f:
+                source = state["rows"][image["row"]]["file"]
+                if _file_stamp(source) == state["files"][source]:
+                    image["arrays"] = {key: f["image"][key][()] for key in f["image"]}
+        self.cancel_loading()
+        for name, widget in self._session_widgets().items():
+            if name in state["settings"]:
+                _set_widget_value(widget, state["settings"][name])
+        self._session = state
+        self.load_progress.setRange(0, 0)
+        self.load_progress.setValue(0)
+        started = set()
+        missing = []
+        for row in state["rows"]:
+            data_key = f"{row['file']}_{row['file-entry']}"
+            if data_key in self.data or data_key in started:
+                continue
+            if not os.path.isfile(row["file"]):
+                missing.append(row["file"])
+                continue
+            started.add(data_key)
+            self._start_loader(row["file"], row["file-entry"])
+        self._update_load_progress()
+        if missing:
+            self.statusBar().showMessage(
+                "Files of the session not found: " + ", ".join(missing)
+            )
+        if not self._loading_files:
+            self._apply_session()
+
+    def _apply_session(self):
+        """
+        Restore the table rows and the image of a session after its files are loaded.
+        """
+        state, self._session = self._session, None
+        rows = []
+        row_numbers = {}
+        for i, row in enumerate(state["rows"]):
+            data = self.data.get(f"{row['file']}_{row['file-entry']}")
+            if data is None:
+                continue
+            row = dict(row)
+            # The file may have changed since the session was saved.
+            if row["data-set"] not in data:
+                row["data-set"] = next(iter(data))
+            keys = data[row["data-set"]]
+            for column in ("X", "Y"):
+                if row[column] not in keys:
+                    row[column] = next(iter(keys), "")
+            row_numbers[i] = self.plot_model.rowCount() + len(rows)
+            rows.append(row)
+        self._insert_rows(rows)
+        image = state["image"]
+        if image is None or image["row"] not in row_numbers:
+            return
+        number = row_numbers[image["row"]]
+        selection = _selection_from_json(image["selection"])
+        _, _, _, _, x_ax, y_ax, filters = selection
+        self.make_multi_selection_widget(number)
+        self.multi_selection_widget.set_selection(x_ax, y_ax, dict(filters))
+        self.intensity_line_lo.setValue(image["lo"])
+        self.intensity_line_hi.setValue(image["hi"])
+        self._session_roi = image["roi"]
+        arrays = image.get("arrays")
+        if arrays is not None:
+            intensities = arrays.pop("intensities")
+            self._session_index = (selection, arrays)
+            if len(arrays["y_values"]) > 1:
+                # Shown until the background computation is done.
+                self.image.setImage(
+                    intensities, levels=[np.min(intensities), np.max(intensities)]
+                )
+                self.image_plot.show()
+        self.update_image(number)
+
+    def _session_widgets(self):
+        """
+        The widgets of the settings that are stored in a session.
+
+        Returns:
+            dict: The widgets by name.
+        """
+        return {
+            "dark_mode": self.dark_mode_box,
+            "downsample": self.downsample_box,
+            "clip_to_view": self.clip_to_view_box,
+            "symbol_limit": self.symbol_limit_box,
+            "memory_budget": self.memory_budget_box,
+            "follow": self.follow_box,
+            "overlay": self.overlay_box,
+            "overlay_offset": self.overlay_offset_box,
+            "overlay_colors": self.overlay_colors_box,
+            "roi_reduce": self.roi_reduce_box,
+        }
+
+    def _follow_toggle(self, state):
+        """
+        Start or stop following the loaded files.
+
+        Parameters:
+            state (bool): If True, appended data is read and shown.
+        """
+        if self.file_watcher.files():
+            self.file_watcher.removePaths(self.file_watcher.files())
+        if state:
+            self.file_watcher.addPaths(list(self._file_data_keys))
+            self.follow_timer.start()
+            self._refresh_followed_files()
+        else:
+            self.follow_timer.stop()
+
+    def _refresh_followed_files(self):
+        """
+        Check all loaded files for appended data.
+        """
+        for file_path in self._file_data_keys:
+            self._refresh_file(file_path)
+
+    def _refresh_file(self, file_path):
+        """
+        Read the data appended to a file in the background.
+
+        Only the new rows of columns that are loaded are read, see
+        `LazyDataSet.read_new_rows`. Refreshes of the same file are coalesced.
+
+        Parameters:
+            file_path (str): Path of the file.
+        """
+        if not self.follow_box.isChecked() or file_path not in self._file_data_keys:
+            return
+        if file_path not in self.file_watcher.files() and os.path.isfile(file_path):
+            # Files that are replaced while writing drop out of the watcher.
+            self.file_watcher.addPath(file_path)
+        data_sets = {
+            (data_key, name): data_set
+            for data_key in self._file_data_keys[file_path]
+            for name, data_set in self.data[data_key].items()
+        }
+
+        def read_new_rows():
+            try:
+                return {
+                    ident: data_set.read_new_rows()
+                    for ident, data_set in data_sets.items()
+                }
+            except Exception as e:
+                # The writer may hold the file, try again with the next change.
+                return {"error": e}
+
+        self.recompute_scheduler.schedule(
+            f"follow {file_path}",
+            read_new_rows,
+            lambda updates: self._apply_file_update(file_path, data_sets, updates),
+        )
+
+    def _apply_file_update(self, file_path, data_sets, updates):
+        """
+        Append the new data of a followed file and update the affected plots.
+
+        The plot items are updated with `setData`, the image of a changed data
+        set is computed again.
+
+        Parameters:
+            file_path (str): Path of the file.
+            data_sets (dict): The refreshed data sets by (data key, data-set name).
+            updates (dict): The results of `read_new_rows` with the same keys.
+        """
+        if "error" in updates:
+            self.statusBar().showMessage(
+                f"Could not read {file_path}: {updates['error']}", 5000
             )
-            self.data[f"{file_path}_{key}"] = data
-            self.add_table_row(data=data, fname=file_path, entry_name=key)
+            return
+        changed = {}
+        for ident, update in updates.items():
+            if self.data.get(ident[0], {}).get(ident[1]) is not data_sets[ident]:
+                # The file was loaded again in the meantime.
+                continue
+            changed[ident] = set(data_sets[ident].append_rows(update))
+        for row in range(self.plot_model.rowCount()):
+            ident = (self._data_key(row), self.plot_model.value(row, "data-set"))
+            if not changed.get(ident):
+                continue
+            x_name = self.plot_model.value(row, "X")
+            y_name = self.plot_model.value(row, "Y")
+            if not {x_name, y_name} & changed[ident]:
+                continue
+            if self._image_selection is not None and self._image_selection[:2] == ident:
+                self._image_selection = None
+                self._schedule_intensities(self._current_image_number)
+            elif row < len(self.plot_items) and self.plot_items[row].xData is not None:
+                try:
+                    x = data_sets[ident][x_name].astype(float, copy=False)
+                    y = data_sets[ident][y_name].astype(float, copy=False)
+                except ValueError:
+                    continue
+                if x.ndim == 1 and y.ndim == 1:
+                    self.plot_items[row].setData(x, y)
+                    self._apply_plot_settings(row, self.plot_items[row])
+        self._update_memory_label()
+
+    def closeEvent(self, event):
+        """
+        Cancel the background loading when the viewer is closed.
+        """
+        self.cancel_loading()
+        self.follow_timer.stop()
+        self.load_pool.waitForDone()
+        self.recompute_scheduler.pool.waitForDone()
+        super().closeEvent(event)
 
     def update_plot(self):
         """
@@ -521,58 +1111,64 @@ class CAMELS_Viewer(QtWidgets.QMainWindow):
         self.xy_plot.clear()
         self.roi_intensity_plot.clear()
         self.plot_items.clear()
-        for row in range(self.plot_table.rowCount()):
+        for row in range(self.plot_model.rowCount()):
             self._add_or_change_plot_data(row)
 
-    def _get_current_data(self, number, as_dataframe=False):
+    def _data_key(self, number):
         """
-        Retrieve the current dataset for the specified table row.
+        Key of the loaded data in `self.data` for the specified table row.
 
         Parameters:
             number (int): Row number in the plot table.
-            as_dataframe (bool): Return data as pandas DataFrame if True.
 
         Returns:
-            dict or pandas.DataFrame: The current dataset.
+            str: The key, made of file name and entry name.
+        """
+        file_name = self.plot_model.value(number, "file")
+        entry_name = self.plot_model.value(number, "file-entry")
+        return f"{file_name}_{entry_name}"
+
+    def _get_current_data(self, number):
         """
-        file_name = self.plot_table.item(number, 7).text()
-        entry_name = self.plot_table.item(number, 8).text()
-        data_set = self.plot_table.cellWidget(number, 3).currentText()
-        data = copy.deepcopy(self.data[f"{file_name}_{entry_name}"][data_set])
-        if as_dataframe:
-            import pandas as pd
+        Retrieve the current dataset for the specified table row.
+
+        Parameters:
+            number (int): Row number in the plot table.
 
-            for key in data.keys():
-                if data[key].ndim > 1:
-                    data[key] = [np.array(x) for x in data[key]]
-            return pd.DataFrame(data)
-        return data
+        Returns:
+            LazyDataSet: The current dataset. Its arrays are read from the
+            file when accessed and are read-only, operations that need to
+            change the data have to work on copies.
+        """
+        data_set = self.plot_model.value(number, "data-set")
+        return self.data[self._data_key(number)][data_set]
 
-    def _add_or_change_plot_data(self, number):
+    def _add_or_change_plot_data(self, number, auto_range=True):
         """
         Add a new plot or update an existing one based on the current selections.
 
         Parameters:
             number (int): Row number in the plot table.
+            auto_range (bool): Whether to fit the view to the data afterwards.
         """
-        x_data = self.plot_table.cellWidget(number, 1).currentText()
-        y_data = self.plot_table.cellWidget(number, 2).currentText()
+        x_data = self.plot_model.value(number, "X")
+        y_data = self.plot_model.value(number, "Y")
         if not x_data or not y_data:
             return
         color = matplotlib_default_colors[
-            self.plot_table.cellWidget(number, 4).currentText()
+            self.plot_model.value(number, "color")
         ]
-        symbol = self.plot_table.cellWidget(number, 5).currentText()
-        linestyle = self.plot_table.cellWidget(number, 6).currentText()
+        linestyle = self.plot_model.value(number, "linestyle")
         data = self._get_current_data(number)
+        self._update_columns_in_use()
         try:
             x = data[x_data]
             y = data[y_data]
         except KeyError:
             return
         try:
-            x = x.astype(float)
-            y = y.astype(float)
+            x = x.astype(float, copy=False)
+            y = y.astype(float, copy=False)
         except ValueError:
             print("Could not convert data to float.")
             return
@@ -581,9 +1177,11 @@ class CAMELS_Viewer(QtWidgets.QMainWindow):
         self.intensity_line_lo.sigPositionChanged.disconnect()
         self.intensity_line_hi.sigPositionChanged.disconnect()
 
-        # Set the intensity lines to data range.
-        self.intensity_line_lo.setValue(x.min())
-        self.intensity_line_hi.setValue(x.max())
+        # Set the intensity lines to data range, known from the column
+        # statistics if they were computed.
+        lo, hi = data.value_range(x_data)
+        self.intensity_line_lo.setValue(lo)
+        self.intensity_line_hi.setValue(hi)
 
         if x.ndim == 1 and y.ndim == 1:
             # 1D plot: create or update a plot data item.
@@ -610,18 +1208,20 @@ class CAMELS_Viewer(QtWidgets.QMainWindow):
                     )
                 )
             # Set the marker symbol and brush.
-            item.setSymbol(symbols[symbol])
             item.setSymbolBrush(pg.mkBrush(color))
             item.setSymbolPen(pg.mkPen(color))
-            do_plot = self.plot_table.item(number, 0).checkState()
-            if do_plot == Qt.Checked:
+            self._apply_plot_settings(number, item)
+            if self.plot_model.value(number, "plot?"):
                 item.show()
             else:
                 item.hide()
-            self.xy_plot.autoRange()
+            if auto_range:
+                self.xy_plot.autoRange()
             self.image_plot.hide()
             self.roi_intensity_plot.hide()
             self.multi_selection_widget.hide()
+            # The columns of the hidden image may be unloaded now.
+            self._image_columns_in_use = []
         elif x.ndim == 2 and y.ndim == 2:
             # 2D plot (integrated image) requires the multi-selection widget.
             self.make_multi_selection_widget(number)
@@ -631,6 +1231,153 @@ class CAMELS_Viewer(QtWidgets.QMainWindow):
             print("Could not plot data, please check the data shapes.")
             return
 
+    def _update_columns_in_use(self, image_number=None, image_columns=()):
+        """
+        Update the columns that the memory manager must not unload.
+
+        These are the X and Y columns of every table row and, while an image
+        is shown, its axes and filters.
+
+        Parameters:
+            image_number (int): Row number of the shown image, if any.
+            image_columns (list): Names of the columns used for the image.
+        """
+        if image_number is not None:
+            data_set = self._get_current_data(image_number)
+            self._image_columns_in_use = [(data_set, key) for key in image_columns]
+        in_use = list(self._image_columns_in_use)
+        for row in range(self.plot_model.rowCount()):
+            data_set = self._get_current_data(row)
+            for col in ("X", "Y"):
+                key = self.plot_model.value(row, col)
+                in_use.append((data_set, key))
+        self._columns_in_use = in_use
+
+    def _memory_budget_changed(self, value):
+        """
+        Apply a new memory budget and unload data if needed.
+
+        Parameters:
+            value (int): The budget in MB.
+        """
+        self.memory_manager.budget = value * 1024**2
+        self.memory_manager.evict()
+        self._update_memory_label()
+
+    def _update_memory_label(self):
+        """
+        Show the memory of the loaded data in the status bar, per file in the tooltip.
+        """
+        mb = 1024**2
+        per_file = self.memory_manager.bytes_per_file()
+        total = sum(per_file.values())
+        self.memory_label.setText(
+            f"data in memory: {total / mb:.1f} / {self.memory_manager.budget / mb:.0f} MB"
+        )
+        self.memory_label.setToolTip(
+            "\n".join(
+                f"{file_path}: {nbytes / mb:.1f} MB"
+                for file_path, nbytes in sorted(per_file.items())
+            )
+        )
+
+    @contextmanager
+    def _timed(self, name):
+        """
+        Measure the duration of a stage on the GUI thread for the performance info.
+
+        Parameters:
+            name (str): Name of the stage.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = time.perf_counter() - start
+
+    def _update_performance_info(self):
+        """
+        Show the timings of the stages, the plotted points and the memory per file.
+        """
+        if not self.performance_info_box.isChecked():
+            self.performance_info.hide()
+            return
+        ms = 1000
+        mb = 1024**2
+        lines = ["files (metadata / data read):"]
+        per_file = self.memory_manager.bytes_per_file()
+        for data in self.data.values():
+            file_path = next(iter(data.values())).file_path
+            bytes_read = sum(data_set.bytes_read for data_set in data.values())
+            read_time = sum(data_set.read_time for data_set in data.values())
+            lines.append(
+                f"  {os.path.basename(file_path)}: "
+                f"{self.load_times.get(file_path, 0) * ms:.0f} ms / "
+                f"{bytes_read / mb:.1f} MB in {read_time * ms:.0f} ms, "
+                f"{per_file.get(file_path, 0) / mb:.1f} MB in memory"
+            )
+        lines.append("recompute (background / apply):")
+        for key, (compute_time, apply_time) in self.recompute_scheduler.timings.items():
+            lines.append(
+                f"  {key}: {compute_time * ms:.1f} ms / {apply_time * ms:.1f} ms"
+            )
+        for name, duration in self.timings.items():
+            lines.append(f"{name}: {duration * ms:.1f} ms")
+        lines.append(f"frame: {self.graphics_view.frame_time * ms:.1f} ms")
+        n_points = sum(
+            len(item.xData)
+            for item in self.plot_items
+            if item.isVisible() and item.xData is not None
+        )
+        n_points += sum(len(item.xData) for item in self.overlay_items)
+        lines.append(f"points: {n_points}")
+        if self.image_data is not None and self.image_plot.isVisible():
+            lines.append(f"image pixels: {self.image_data.size}")
+        self.performance_info.setText("\n".join(lines))
+        self.performance_info.show()
+
+    def _apply_plot_settings(self, number, item):
+        """
+        Apply the performance settings and the symbol of a table row to its plot item.
+
+        Parameters:
+            number (int): Row number in the plot table.
+            item (pg.PlotDataItem): The plot item of the row.
+        """
+        item.setDownsampling(auto=self.downsample_box.isChecked(), method="peak")
+        item.setClipToView(self.clip_to_view_box.isChecked())
+        symbol = symbols[self.plot_model.value(number, "symbol")]
+        n_points = 0 if item.xData is None else len(item.xData)
+        if n_points > self.symbol_limit_box.value():
+            # Too many points, drawing a symbol for each is too slow.
+            symbol = None
+        item.setSymbol(symbol)
+
+    def _apply_plot_settings_to_all(self):
+        """
+        Apply the performance settings to the plot items of all table rows.
+        """
+        for number, item in enumerate(self.plot_items):
+            self._apply_plot_settings(number, item)
+
+    def _opengl_toggle(self, state):
+        """
+        Switch rendering of the plots with OpenGL on or off.
+
+        Parameters:
+            state (bool): If True, use OpenGL.
+        """
+        use_opengl = bool(state)
+        try:
+            pg.setConfigOptions(useOpenGL=use_opengl)
+            self.graphics_view.useOpenGL(use_opengl)
+        except Exception as e:
+            pg.setConfigOptions(useOpenGL=False)
+            self.opengl_box.blockSignals(True)
+            self.opengl_box.setChecked(False)
+            self.opengl_box.blockSignals(False)
+            self.statusBar().showMessage(f"Could not enable OpenGL: {e}")
+
     def update_intensity_line(self):
         """
         Hides image-related plots.
@@ -642,19 +1389,30 @@ class CAMELS_Viewer(QtWidgets.QMainWindow):
         """
         Update the image plot using filters and current selections from the multi-selection widget.
 
+        The computation is debounced and runs in the background, see
+        `RecomputeScheduler`.
+
+        Parameters:
+            number (int): Row number in the plot table.
+        """
+        self._full_image_update = True
+        self._schedule_intensities(number)
+
+    def _finish_update_image(self, number):
+        """
+        Connect the intensity lines and show the image after a full update.
+
         Parameters:
             number (int): Row number in the plot table.
         """
-        if not self._update_intensities(number):
-            return
         # Reconnect intensity line signals for interactivity.
         self.intensity_line_hi.sigPositionChanged.disconnect()
         self.intensity_line_lo.sigPositionChanged.disconnect()
         self.intensity_line_lo.sigPositionChanged.connect(
-            lambda stat=None, val=number: self._update_intensities(val)
+            lambda stat=None, val=number: self._schedule_intensities(val)
         )
         self.intensity_line_hi.sigPositionChanged.connect(
-            lambda stat=None, val=number: self._update_intensities(val)
+            lambda stat=None, val=number: self._schedule_intensities(val)
         )
         self._current_image_number = number
         y_name = self.multi_selection_widget.y_image_box.currentText()
@@ -668,139 +1426,207 @@ class CAMELS_Viewer(QtWidgets.QMainWindow):
         self.image_plot.enableAutoRange()
         self.histogram.show()
         self.image_plot.autoRange()
-        self.image_ROI.setPos((0, 0))
+        if self._session_roi is not None:
+            pos, size = self._session_roi
+            self._session_roi = None
+            self.image_ROI.setSize(size)
+            self.image_ROI.setPos(pos)
+        else:
+            self.image_ROI.setPos((0, 0))
         self._image_roi_moved()
 
-    def _update_intensities(self, number):
+    def _schedule_intensities(self, number):
         """
-        Compute integrated intensity over the selected x-range and update the image.
+        Schedule the computation of the integrated intensities in the background.
+
+        Only the latest of quickly following requests is computed and shown.
+
+        Parameters:
+            number (int): Row number in the plot table.
+        """
+        state = self._image_state(number)
+        self.recompute_scheduler.schedule(
+            "image",
+            lambda: self._compute_intensities(state),
+            lambda result: self._apply_intensities(number, result),
+        )
+
+    def _image_state(self, number):
+        """
+        Collect everything the computation of the image needs from the widgets.
 
         Parameters:
             number (int): Row number in the plot table.
 
         Returns:
-            bool: True if update is successful, False otherwise.
+            dict: The data, the selection, the integration range and the
+            cached index of the previous selection.
         """
-        data = self._get_current_data(number, as_dataframe=True)
-        x_name = self.plot_table.cellWidget(number, 1).currentText()
-        y_name = self.plot_table.cellWidget(number, 2).currentText()
         x_ax = self.multi_selection_widget.x_image_box.currentText()
         y_ax = self.multi_selection_widget.y_image_box.currentText()
-        self.image.clear()
-        self.roi_intensity_plot.clear()
-        if x_ax == y_ax:
-            self.image_info_text.setText("Select different axes for the image.")
-            self.image_info_text.show()
-            self.image_plot.show()
-            self.roi_intensity_plot.hide()
-            return False
-        try:
-            if y_ax == "None":
-                sorted_data = data.sort_values([x_ax])
-            else:
-                sorted_data = data.sort_values([x_ax, y_ax])
-        except Exception as e:
-            self.image_info_text.setText(
-                f"Could not make an image of the axes,\nplease check the data and your selection.\n{e}"
-            )
-            self.image_info_text.show()
-            self.image_plot.show()
-            self.roi_intensity_plot.hide()
-            return False
-        # Apply filters from the multi-selection widget.
         filters = self.multi_selection_widget.get_filters()
-        if filters:
-            for key in filters:
-                filter_val = filters[key]
-                # Convert to the data type of the column.
-                try:
-                    filter_val = sorted_data[key].dtype.type(filter_val)
-                except Exception as e:
-                    print(e)
-                    pass
-                sorted_data = sorted_data[sorted_data[key] == filter_val]
-        # Check if filtering left any data.
-        if sorted_data.empty:
-            self.image_info_text.setText(
-                "No data left after filtering.\nCheck your filters!"
-            )
-            self.image_info_text.show()
-            self.image_plot.show()
-            self.roi_intensity_plot.hide()
-            return False
-
-        x_data = sorted_data[x_name]
-        y_data = sorted_data[y_name]
-        x_ax_data = sorted_data[x_ax]
-        if y_ax != "None":
-            y_ax_data = sorted_data[y_ax]
-        else:
-            y_ax_data = np.zeros((1))
-        if x_ax_data.ndim != 1 or y_ax_data.ndim != 1:
-            self.image_info_text.setText("Please select 1D data for x and y axes.")
-            self.image_info_text.show()
-            self.image_plot.show()
-            self.roi_intensity_plot.hide()
-            return False
+        selection = (
+            self._data_key(number),
+            self.plot_model.value(number, "data-set"),
+            self.plot_model.value(number, "X"),
+            self.plot_model.value(number, "Y"),
+            x_ax,
+            y_ax,
+            tuple(sorted(filters.items())),
+        )
         # Get the positions from the intensity lines.
         lo_pos = self.intensity_line_lo.value()
         hi_pos = self.intensity_line_hi.value()
         if lo_pos > hi_pos:
             self.intensity_line_lo.setValue(hi_pos)
-        intensities = []
-        # Integrate intensity for each data entry within the selected range.
-        for i, y_val in y_data.items():
-            x_val = x_data[i]
-            lo_filtered = np.where(x_val >= lo_pos)
-            x_lo = x_val[lo_filtered]
-            y_lo = y_val[lo_filtered]
-            hi_filtered = np.where(x_lo <= hi_pos)
-            x_filtered = x_lo[hi_filtered]
-            y_filtered = y_lo[hi_filtered]
-
-            val = np.trapezoid(y_filtered, x=x_filtered)
-            intensities.append(val)
-        intensities = np.array(intensities)
-        try:
-            # Determine unique x and y values for the image grid.
-            self.image_x_values = sorted(list(set(x_ax_data)))
-            self.image_y_values = sorted(list(set(y_ax_data)))
-            xlen = len(self.image_x_values)
-            ylen = len(self.image_y_values)
-            self.image_data = np.reshape(intensities, (xlen, ylen))
-        except Exception as e:
-            self.image_info_text.setText(
-                f"Error: incompatible data shapes.\nYou may need to select other axes for the image.\n{e}"
-            )
-            self.image_info_text.show()
-            self.image_plot.show()
-            self.roi_intensity_plot.hide()
-            return False
+        return {
+            "data": self._get_current_data(number),
+            "selection": selection,
+            "lo": lo_pos,
+            "hi": hi_pos,
+            "cache": (
+                self._image_selection,
+                self.image_index,
+                self._integrator,
+                self._spectrum_cube,
+            ),
+            "restored": self._session_index,
+        }
+
+    @staticmethod
+    def _compute_intensities(state):
+        """
+        Compute the integrated intensity over the selected x-range.
 
-        self.sorted_data = sorted_data
-        self.image_info_text.hide()
-        # If more than one y value, display image; otherwise, use a plot.
-        if ylen > 1:
-            self.image.setImage(
-                self.image_data, levels=[np.min(intensities), np.max(intensities)]
-            )
-        else:
-            try:
+        Sorting, filtering and stacking the spectra is only done when the
+        selection differs from the cached one, not when the intensity lines
+        are dragged. The sorting is skipped as well if a restored session
+        stored the grid index of the selection. The needed columns that are
+        not loaded yet are read together. This does not access any widgets,
+        so it can run in a worker thread.
+
+        Parameters:
+            state (dict): The state returned by `_image_state`.
+
+        Returns:
+            dict: Either "error" with a message, or "selection", "index",
+            "integrator", "cube" and "intensities".
+        """
+        selection = state["selection"]
+        _, _, x_name, y_name, x_ax, y_ax, filters = selection
+        cached_selection, index, integrator, cube = state["cache"]
+        if cached_selection != selection:
+            data = state["data"]
+            # Read the spectra, axes and filtered columns with one file open.
+            data.fetch([x_name, y_name, x_ax, y_ax, *(key for key, _ in filters)])
+            if len(_column_shape(data, x_ax)) != 1 or (
+                y_ax != "None" and len(_column_shape(data, y_ax)) != 1
+            ):
+                return {"error": "Please select 1D data for x and y axes."}
+            restored = state["restored"]
+            if restored is not None and restored[0] == selection:
+                index = restored[1]
+            else:
+                index = None
+            try:
+                prepared = prepare_intensity_map(
+                    data, x_name, y_name, x_ax, y_ax, dict(filters), index
+                )
+            except ValueError as e:
+                return {"error": str(e)}
+            index = prepared["index"]
+            integrator = prepared["integrator"]
+            x = prepared["x"]
+            if integrator.shared_x and x.ndim == 2:
+                x = x[0]
+            cube = SpectrumCube(x, prepared["y"], index)
+        # Integrate intensity for each data entry within the selected range.
+        return {
+            "selection": selection,
+            "index": index,
+            "integrator": integrator,
+            "cube": cube,
+            "intensities": integrator.integrate(state["lo"], state["hi"]),
+        }
+
+    def _apply_intensities(self, number, result):
+        """
+        Show the integrated intensities computed by `_compute_intensities`.
+
+        Parameters:
+            number (int): Row number in the plot table.
+            result (dict): The result of `_compute_intensities`.
+
+        Returns:
+            bool: True if update is successful, False otherwise.
+        """
+        full_update = self._full_image_update
+        self._full_image_update = False
+        self.image.clear()
+        self.roi_intensity_plot.clear()
+        # The stored index of a session is used, or outdated, now.
+        self._session_index = None
+        if "error" in result:
+            self._image_selection = None
+            return self._show_image_info(result["error"])
+        if self._image_selection != result["selection"]:
+            _, _, _, _, x_ax, y_ax, filters = result["selection"]
+            self._update_columns_in_use(
+                number, [x_ax, y_ax] + [key for key, _ in filters]
+            )
+        new_selection = self._image_selection != result["selection"]
+        self._image_selection = result["selection"]
+        self.image_index = result["index"]
+        if new_selection:
+            self._schedule_overlay(number)
+        self._integrator = result["integrator"]
+        self._spectrum_cube = result["cube"]
+        intensities = result["intensities"]
+        self.image_x_values = self.image_index["x_values"]
+        self.image_y_values = self.image_index["y_values"]
+        ylen = len(self.image_y_values)
+        self.image_data = intensities.reshape(self.image_index["lookup"].shape)
+
+        self.image_info_text.hide()
+        # If more than one y value, display image; otherwise, use a plot.
+        if ylen > 1:
+            self.image.setImage(
+                self.image_data, levels=[np.min(intensities), np.max(intensities)]
+            )
+        else:
+            try:
                 self.roi_intensity_plot.plot(
-                    x_ax_data.to_numpy(), intensities, pen=pg.mkPen(width=2), symbol="o"
+                    self.image_x_values[self.image_index["ix"]],
+                    intensities,
+                    pen=pg.mkPen(width=2),
+                    symbol="o",
                 )
                 self.roi_intensity_plot.show()
                 self.roi_intensity_plot.autoRange()
                 self.roi_intensity_plot.addItem(self.pos_line_1d)
             except Exception as e:
                 print(e)
-                self.image_info_text.setText(f"Error: {e}")
-                self.image_info_text.show()
-                self.image_plot.show()
-                self.roi_intensity_plot.hide()
-                return False
+                return self._show_image_info(f"Error: {e}")
+        if full_update:
+            self._finish_update_image(number)
         return True
 
+    def _show_image_info(self, text):
+        """
+        Show a message instead of the image.
+
+        Parameters:
+            text (str): The message to show.
+
+        Returns:
+            bool: Always False, so that it can be returned by failing updates.
+        """
+        self.image_info_text.setText(text)
+        self.image_info_text.show()
+        self.image_plot.show()
+        self.roi_intensity_plot.hide()
+        return False
+
     def _pos_line_moved(self):
         """
         Handler for when the horizontal line in the 1D intensity plot is moved.
@@ -808,13 +1634,16 @@ class CAMELS_Viewer(QtWidgets.QMainWindow):
         It updates the x position and refreshes the x-y plot accordingly.
         """
         x = self.pos_line_1d.value()
-        if min(self.image_x_values) <= x <= max(self.image_x_values):
+        # The image values are sorted, the first and last are the limits.
+        x_min = self.image_x_values[0]
+        x_max = self.image_x_values[-1]
+        if x_min <= x <= x_max:
             self.last_x = x
         else:
-            if self.last_x < min(self.image_x_values):
-                self.last_x = min(self.image_x_values)
-            elif self.last_x > max(self.image_x_values):
-                self.last_x = max(self.image_x_values)
+            if self.last_x < x_min:
+                self.last_x = x_min
+            elif self.last_x > x_max:
+                self.last_x = x_max
             self.pos_line_1d.setValue(self.last_x)
             return
         closest_x = np.abs(np.array(self.image_x_values) - x).argmin()
@@ -824,62 +1653,480 @@ class CAMELS_Viewer(QtWidgets.QMainWindow):
         self.image_xlabel.setText(x_text)
         self.image_ylabel.setText("")
 
-        x_name = self.plot_table.cellWidget(self._current_image_number, 1).currentText()
-        y_name = self.plot_table.cellWidget(self._current_image_number, 2).currentText()
-        x_data = self.sorted_data[x_name][self.sorted_data[x_ax_name] == xpos]
-        y_data = self.sorted_data[y_name][self.sorted_data[x_ax_name] == xpos]
-        try:
-            x_data = x_data.to_numpy()[0]
-            y_data = y_data.to_numpy()[0]
-        except Exception:
-            pass
-        self.xy_plot.clear()
-        self.xy_plot.plot(x_data, y_data)
-        self.xy_plot.addItem(self.intensity_line_lo)
-        self.xy_plot.addItem(self.intensity_line_hi)
+        self._show_region_spectrum(closest_x, closest_x + 1, 0, 1)
 
     def _image_roi_moved(self):
         """
-        Handler for when the image ROI is moved.
+        Handler for when the image ROI is moved or resized.
 
-        It updates the x-y labels and the x-y plot based on the current ROI position.
+        It updates the x-y labels and shows the spectrum of the region in the x-y plot.
         """
         x, y = [int(val) for val in self.image_ROI.pos()]
+        width, height = [max(int(round(val)), 1) for val in self.image_ROI.size()]
         if 0 <= x < len(self.image_x_values) and 0 <= y < len(self.image_y_values):
             self.last_x = x
             self.last_y = y
         else:
             self.image_ROI.setPos((self.last_x, self.last_y))
             return
-        xpos = self.image_x_values[x]
-        ypos = self.image_y_values[y]
+        x_end = min(x + width, len(self.image_x_values))
+        y_end = min(y + height, len(self.image_y_values))
         x_ax_name = self.multi_selection_widget.x_image_box.currentText()
         y_ax_name = self.multi_selection_widget.y_image_box.currentText()
-        x_text = f"{x_ax_name} = {xpos}"
-        y_text = f"{y_ax_name} = {ypos}"
-        self.image_xlabel.setText(x_text)
-        self.image_ylabel.setText(y_text)
+        self.image_xlabel.setText(
+            _range_text(x_ax_name, self.image_x_values[x : x_end])
+        )
+        self.image_ylabel.setText(
+            _range_text(y_ax_name, self.image_y_values[y : y_end])
+        )
 
-        x_name = self.plot_table.cellWidget(self._current_image_number, 1).currentText()
-        y_name = self.plot_table.cellWidget(self._current_image_number, 2).currentText()
-        x_data = self.sorted_data[x_name][
-            (self.sorted_data[x_ax_name] == xpos)
-            & (self.sorted_data[y_ax_name] == ypos)
-        ]
-        y_data = self.sorted_data[y_name][
-            (self.sorted_data[x_ax_name] == xpos)
-            & (self.sorted_data[y_ax_name] == ypos)
-        ]
-        try:
-            x_data = x_data.to_numpy()[0]
-            y_data = y_data.to_numpy()[0]
-        except Exception:
-            pass
+        self._show_region_spectrum(x, x_end, y, y_end)
+
+    def _show_region_spectrum(self, ix0, ix1, iy0, iy1):
+        """
+        Plot the spectrum of a region of the image grid in the x-y plot.
+
+        The spectra of the region are reduced as selected in `roi_reduce_box`,
+        see `SpectrumCube`. This runs in the background, see `RecomputeScheduler`.
+
+        Parameters:
+            ix0, ix1 (int): Index range along the image X axis, ix1 is excluded.
+            iy0, iy1 (int): Index range along the image Y axis, iy1 is excluded.
+        """
+        cube = self._spectrum_cube
+        reduce = self.roi_reduce_box.currentText()
+        # Shifted like the first spectrum of the region in the overlay.
+        shift = 0.0
+        if self.overlay_box.isChecked():
+            shift = self.image_index["lookup"][ix0, iy0] * self.overlay_offset_box.value()
+
+        def region_spectrum():
+            x, y = cube.region(ix0, ix1, iy0, iy1, reduce)
+            return x, y + shift
+
+        self.recompute_scheduler.schedule("spectrum", region_spectrum, self._plot_spectrum)
+
+    def _roi_reduce_changed(self):
+        """
+        Show the spectrum of the ROI again with the new reduction.
+        """
+        if self._spectrum_cube is None:
+            return
+        if len(self.image_y_values) > 1:
+            self._image_roi_moved()
+        else:
+            self._pos_line_moved()
+
+    def _plot_spectrum(self, spectrum):
+        """
+        Show a single spectrum together with the intensity lines in the x-y plot.
+
+        Parameters:
+            spectrum (tuple): The x and y data of the spectrum.
+        """
         self.xy_plot.clear()
-        self.xy_plot.plot(x_data, y_data)
+        for item in self.overlay_items:
+            self.xy_plot.addItem(item)
+        if self.overlay_items:
+            # Highlight the selected spectrum on top of the overlay.
+            self.xy_plot.plot(*spectrum, pen=pg.mkPen("r", width=2))
+        else:
+            self.xy_plot.plot(*spectrum)
         self.xy_plot.addItem(self.intensity_line_lo)
         self.xy_plot.addItem(self.intensity_line_hi)
 
+    def _overlay_settings_changed(self):
+        """
+        Draw the overlay again after its settings changed.
+        """
+        if self._image_selection is not None:
+            self._schedule_overlay(self._current_image_number)
+
+    def _schedule_overlay(self, number):
+        """
+        Schedule stacking all spectra of the current image for the overlay.
+
+        The spectra are ordered as in the image and concatenated into few
+        arrays in the background, see `_stack_curves`.
+
+        Parameters:
+            number (int): Row number in the plot table.
+        """
+        if not self.overlay_box.isChecked():
+            # Scheduled as well, so that a running stacking is dropped.
+            self.recompute_scheduler.schedule("overlay", list, self._show_overlay)
+            return
+        data = self._get_current_data(number)
+        x_name = self.plot_model.value(number, "X")
+        y_name = self.plot_model.value(number, "Y")
+        rows = self.image_index["rows"]
+        offset = self.overlay_offset_box.value()
+        n_groups = len(overlay_colors) if self.overlay_colors_box.isChecked() else 1
+        self.recompute_scheduler.schedule(
+            "overlay",
+            lambda: _stack_curves(
+                data[x_name][rows], data[y_name][rows], offset, n_groups
+            ),
+            self._show_overlay,
+        )
+
+    def _show_overlay(self, curves):
+        """
+        Replace the overlay in the x-y plot.
+
+        Parameters:
+            curves (list): (x, y, connect) for every curve item, as returned
+                by `_stack_curves`.
+        """
+        for item in self.overlay_items:
+            self.xy_plot.removeItem(item)
+        self.overlay_items = []
+        for i, (x, y, connect) in enumerate(curves):
+            if len(curves) > 1:
+                color = overlay_colors[i * (len(overlay_colors) - 1) // (len(curves) - 1)]
+            else:
+                color = matplotlib_default_colors["gray"]
+            item = pg.PlotCurveItem(x, y, connect=connect, pen=pg.mkPen(color))
+            item.setZValue(-1)
+            self.xy_plot.addItem(item)
+            self.overlay_items.append(item)
+        if curves:
+            self.xy_plot.autoRange()
+
+
+class RecomputeScheduler(QtCore.QObject):
+    """
+    Debounces and coalesces recomputations triggered by interactions and
+    runs them in a worker thread.
+
+    Every call of `schedule` replaces the pending job of the same key. A job
+    starts a short time after the first of quickly following signals (e.g.
+    while dragging), so they lead to one computation, while continuous input
+    still updates regularly. Only one job per key runs at a time. Results of
+    jobs that were superseded by newer input while running are dropped, only
+    the result of the latest input is applied on the GUI thread.
+
+    The durations of the last computation and application of each key are
+    kept in `timings`.
+
+    Parameters:
+        parent (QObject): The parent object.
+        delay (int): Debounce time in milliseconds.
+    """
+
+    _finished = QtCore.Signal(str, int, object, object, float)
+
+    def __init__(self, parent=None, delay=30):
+        super().__init__(parent)
+        self.delay = delay
+        self.pool = QtCore.QThreadPool(self)
+        self.timings = {}
+        self._jobs = {}
+        self._finished.connect(self._job_finished)
+
+    def schedule(self, key, compute, apply):
+        """
+        Schedule a computation, replacing any pending one of the same key.
+
+        Parameters:
+            key (str): Identifier of the kind of computation.
+            compute (callable): Runs in a worker thread, must not access widgets.
+            apply (callable): Called with the result of `compute` on the GUI thread.
+        """
+        if key not in self._jobs:
+            timer = QtCore.QTimer(self)
+            timer.setSingleShot(True)
+            timer.timeout.connect(lambda k=key: self._start(k))
+            self._jobs[key] = {"generation": 0, "running": False, "timer": timer}
+        job = self._jobs[key]
+        job["generation"] += 1
+        job["compute"] = compute
+        job["apply"] = apply
+        if not job["timer"].isActive():
+            job["timer"].start(self.delay)
+
+    def _start(self, key):
+        job = self._jobs[key]
+        if job["running"]:
+            # Started again with the latest input when the running job is done.
+            return
+        job["running"] = True
+        self.pool.start(_RecomputeRunnable(self, key, job["generation"], job["compute"]))
+
+    def _job_finished(self, key, generation, result, exception, compute_time):
+        job = self._jobs[key]
+        job["running"] = False
+        if generation != job["generation"]:
+            # Newer input arrived, drop this result and compute the latest.
+            if not job["timer"].isActive():
+                self._start(key)
+            return
+        if exception is not None:
+            raise exception
+        start = time.perf_counter()
+        job["apply"](result)
+        self.timings[key] = (compute_time, time.perf_counter() - start)
+
+
+class _RecomputeRunnable(QtCore.QRunnable):
+    """
+    Runs one computation of a RecomputeScheduler in its thread pool.
+    """
+
+    def __init__(self, scheduler, key, generation, compute):
+        super().__init__()
+        self.scheduler = scheduler
+        self.key = key
+        self.generation = generation
+        self.compute = compute
+
+    def run(self):
+        """
+        Run the computation and report the result to the scheduler.
+        """
+        start = time.perf_counter()
+        try:
+            result = self.compute()
+        except Exception as e:
+            self.scheduler._finished.emit(
+                self.key, self.generation, None, e, time.perf_counter() - start
+            )
+            return
+        self.scheduler._finished.emit(
+            self.key, self.generation, result, None, time.perf_counter() - start
+        )
+
+
+class FileLoadSignals(QtCore.QObject):
+    """
+    Signals of a FileLoader, QRunnable itself cannot emit signals.
+
+    Signals:
+        loaded (FileLoader, dict): The loader and the loaded data.
+        failed (FileLoader, Exception): The loader and the raised exception.
+    """
+
+    loaded = QtCore.Signal(object, object)
+    failed = QtCore.Signal(object, object)
+
+
+class FileLoader(QtCore.QRunnable):
+    """
+    Reads one CAMELS file in a thread of a QThreadPool.
+
+    Parameters:
+        file_path (str): Path of the file to read.
+        entry_key (str): The entry of the file to read.
+        generation (int): Counter of the viewer to recognize cancelled loads.
+    """
+
+    def __init__(self, file_path, entry_key, generation):
+        super().__init__()
+        self.file_path = file_path
+        self.entry_key = entry_key
+        self.generation = generation
+        self.signals = FileLoadSignals()
+        # Time in seconds needed to read the file.
+        self.duration = 0.0
+
+    def run(self):
+        """
+        Read the file and emit the result.
+        """
+        start = time.perf_counter()
+        try:
+            # Only the metadata is read, the arrays are read when plotted.
+            data = read_camels_file(
+                self.file_path,
+                entry_key=self.entry_key,
+                read_all_datasets=True,
+                lazy=True,
+            )
+        except Exception as e:
+            self.signals.failed.emit(self, e)
+            return
+        self.duration = time.perf_counter() - start
+        self.signals.loaded.emit(self, data)
+
+
+class PlotTableModel(QtCore.QAbstractTableModel):
+    """
+    Model of the plot table, one row per plot.
+
+    The rows only store the selected texts. The choices for the combo boxes
+    are shared `QStringListModel`s, rows whose data sets have the same
+    columns use the same model.
+
+    Parameters:
+        get_data (callable): Returns the loaded data (dict of data sets) of a row.
+        parent (QObject): The parent object.
+    """
+
+    columns = [
+        "plot?",
+        "X",
+        "Y",
+        "data-set",
+        "color",
+        "symbol",
+        "linestyle",
+        "file",
+        "file-entry",
+    ]
+
+    def __init__(self, get_data, parent=None):
+        super().__init__(parent)
+        self.get_data = get_data
+        self._rows = []
+        self._choice_models = {}
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role == Qt.DisplayRole:
+            return self.columns[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        column = self.columns[index.column()]
+        value = self._rows[index.row()][column]
+        if column == "plot?":
+            if role == Qt.CheckStateRole:
+                return Qt.Checked if value else Qt.Unchecked
+            return None
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return value
+        if role == Qt.DecorationRole and column == "color":
+            return QtGui.QColor(matplotlib_default_colors[value])
+        return None
+
+    def flags(self, index):
+        column = self.columns[index.column()]
+        if column == "plot?":
+            return Qt.ItemIsUserCheckable | Qt.ItemIsEnabled
+        if column in ("file", "file-entry"):
+            return Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsEditable
+
+    def setData(self, index, value, role=Qt.EditRole):
+        column = self.columns[index.column()]
+        if column == "plot?" and role == Qt.CheckStateRole:
+            value = Qt.CheckState(value) == Qt.Checked
+        elif role != Qt.EditRole:
+            return False
+        if self._rows[index.row()][column] == value:
+            return False
+        self._rows[index.row()][column] = value
+        self.dataChanged.emit(index, index, [role])
+        return True
+
+    def add_rows(self, rows):
+        """
+        Append rows, notifying the views only once.
+
+        Parameters:
+            rows (list): A dictionary with a value for every column per row.
+        """
+        if not rows:
+            return
+        first = len(self._rows)
+        self.beginInsertRows(QtCore.QModelIndex(), first, first + len(rows) - 1)
+        self._rows.extend(rows)
+        self.endInsertRows()
+
+    def value(self, row, column):
+        """
+        The value of a cell.
+
+        Parameters:
+            row (int): The row.
+            column (str): The name of the column.
+        """
+        return self._rows[row][column]
+
+    def set_values(self, row, values):
+        """
+        Change several values of a row with a single dataChanged signal.
+
+        Parameters:
+            row (int): The row.
+            values (dict): The new values by column name.
+        """
+        self._rows[row].update(values)
+        indices = [self.columns.index(column) for column in values]
+        self.dataChanged.emit(
+            self.index(row, min(indices)), self.index(row, max(indices)), [Qt.EditRole]
+        )
+
+    def choices(self, index):
+        """
+        The model of the possible values of a cell, shared between rows.
+
+        Parameters:
+            index (QModelIndex): The cell.
+
+        Returns:
+            QStringListModel: The choices, None for columns that are not selections.
+        """
+        column = self.columns[index.column()]
+        if column in ("X", "Y"):
+            data = self.get_data(index.row())[self.value(index.row(), "data-set")]
+            values = tuple(data.keys())
+        elif column == "data-set":
+            values = tuple(self.get_data(index.row()).keys())
+        elif column == "color":
+            values = tuple(matplotlib_default_colors)
+        elif column == "symbol":
+            values = tuple(symbols)
+        elif column == "linestyle":
+            values = tuple(linestyles)
+        else:
+            return None
+        if values not in self._choice_models:
+            self._choice_models[values] = QtCore.QStringListModel(list(values), self)
+        return self._choice_models[values]
+
+
+class ComboBoxDelegate(QtWidgets.QStyledItemDelegate):
+    """
+    Edits the cells of a `PlotTableModel` with a combo box.
+
+    The combo box only exists while the cell is edited, it uses the shared
+    choices of the model.
+    """
+
+    def createEditor(self, parent, option, index):
+        choices = index.model().choices(index)
+        if choices is None:
+            return super().createEditor(parent, option, index)
+        editor = QtWidgets.QComboBox(parent)
+        editor.setModel(choices)
+        # The selection is applied as soon as it is made.
+        editor.activated.connect(lambda _=None, e=editor: self._commit(e))
+        return editor
+
+    def setEditorData(self, editor, index):
+        if isinstance(editor, QtWidgets.QComboBox):
+            editor.setCurrentText(index.data(Qt.EditRole))
+        else:
+            super().setEditorData(editor, index)
+
+    def setModelData(self, editor, model, index):
+        if isinstance(editor, QtWidgets.QComboBox):
+            model.setData(index, editor.currentText(), Qt.EditRole)
+        else:
+            super().setModelData(editor, model, index)
+
+    def _commit(self, editor):
+        self.commitData.emit(editor)
+        self.closeEditor.emit(editor, QtWidgets.QAbstractItemDelegate.NoHint)
+
 
 class Multi_Selection_Widget(QtWidgets.QWidget):
     """
@@ -893,6 +2140,9 @@ class Multi_Selection_Widget(QtWidgets.QWidget):
     x_selection_signal = QtCore.Signal(str)
     y_selection_signal = QtCore.Signal(str)
 
+    # Numeric columns with more unique values are filtered by a range.
+    max_values = 100
+
     def __init__(self, data, parent=None, x_selection=None, y_selection=None):
         super().__init__(parent)
         layout = QtWidgets.QGridLayout()
@@ -931,7 +2181,8 @@ class Multi_Selection_Widget(QtWidgets.QWidget):
         layout.addWidget(QtWidgets.QLabel("image Y:"), 1, 0)
         layout.addWidget(self.y_image_box, 1, 1)
 
-        # Create check boxes and combo boxes for filtering data.
+        # Create check boxes and filter widgets. Columns with few values are
+        # filtered by value, numeric columns with many values by a range.
         self.filter_checks = {}
         self.filter_boxes = {}
         i = 2
@@ -939,27 +2190,54 @@ class Multi_Selection_Widget(QtWidgets.QWidget):
             if key == self.x_selection or key == self.y_selection:
                 continue
             # Only consider one-dimensional data with multiple unique values.
-            if data[key].ndim != 1:
+            if len(_column_shape(data, key)) != 1:
                 continue
-            if len(set(data[key])) < 2:
+            choices = _filter_choices(data, key, self.max_values)
+            if choices is None:
                 continue
             check = QtWidgets.QCheckBox(f"filter {key}")
             self.filter_checks[key] = check
-            box = QtWidgets.QComboBox()
+            if isinstance(choices, tuple):
+                box = RangeFilter(*choices)
+                box.range_changed.connect(self._update_filters)
+            else:
+                box = LazyComboBox(choices)
+                box.currentTextChanged.connect(self._update_filters)
             self.filter_boxes[key] = box
-            box.addItems(sorted([str(x) for x in set(data[key])]))
-            box.currentTextChanged.connect(self._update_filters)
             check.stateChanged.connect(self._update_filters)
             layout.addWidget(check, i, 0)
             layout.addWidget(box, i, 1)
             i += 1
 
+    def set_selection(self, x_ax, y_ax, filters):
+        """
+        Select the image axes and filters without emitting the signals.
+
+        Parameters:
+            x_ax (str): The image X axis.
+            y_ax (str): The image Y axis.
+            filters (dict): The filters as returned by `get_filters`.
+        """
+        self.blockSignals(True)
+        self.x_image_box.setCurrentText(x_ax)
+        self.y_image_box.setCurrentText(y_ax)
+        for key, check in self.filter_checks.items():
+            check.setChecked(key in filters)
+            if key in filters:
+                box = self.filter_boxes[key]
+                if isinstance(box, RangeFilter):
+                    box.set_value(*filters[key])
+                else:
+                    box.set_value(filters[key])
+        self.blockSignals(False)
+
     def get_filters(self):
         """
         Retrieve current filters based on checked options.
 
         Returns:
-            dict: A dictionary mapping data keys to selected filter values.
+            dict: A dictionary mapping data keys to selected filter values,
+            or to (min, max) for range filters.
         """
         x = self.x_image_box.currentText()
         y = self.y_image_box.currentText()
@@ -968,7 +2246,11 @@ class Multi_Selection_Widget(QtWidgets.QWidget):
             if key == x or key == y:
                 continue
             if self.filter_checks[key].isChecked():
-                filters[key] = self.filter_boxes[key].currentText()
+                box = self.filter_boxes[key]
+                if isinstance(box, RangeFilter):
+                    filters[key] = box.value()
+                else:
+                    filters[key] = box.currentText()
         return filters
 
     def _enable_filters(self):
@@ -993,6 +2275,319 @@ class Multi_Selection_Widget(QtWidgets.QWidget):
         self.filter_signal.emit(filters)
 
 
+class LazyComboBox(QtWidgets.QComboBox):
+    """
+    A combo box of the values of a column that is filled when it is opened.
+
+    Until then it only contains the first value.
+
+    Parameters:
+        values (np.ndarray): The sorted unique values.
+        parent (QWidget): The parent widget.
+    """
+
+    def __init__(self, values, parent=None):
+        super().__init__(parent)
+        self.values = values
+        self.addItem(str(values[0]))
+
+    def showPopup(self):
+        self._fill()
+        super().showPopup()
+
+    def set_value(self, text):
+        """
+        Select a value, filling the list if needed.
+
+        Parameters:
+            text (str): The value as shown in the list.
+        """
+        self._fill()
+        self.setCurrentText(text)
+
+    def _fill(self):
+        """
+        Add all values to the list, keeping the current one.
+        """
+        if self.values is not None:
+            text = self.currentText()
+            self.blockSignals(True)
+            self.clear()
+            self.addItems([str(x) for x in self.values])
+            self.setCurrentText(text)
+            self.blockSignals(False)
+            self.values = None
+
+
+class RangeFilter(QtWidgets.QWidget):
+    """
+    Two spin boxes to select a range of a numeric column.
+
+    Very small or large values are shown scaled by a power of ten, given as
+    suffix of the spin boxes, with decimals fitting the width of the range.
+
+    Parameters:
+        minimum (float): The smallest value of the column.
+        maximum (float): The largest value of the column.
+        parent (QWidget): The parent widget.
+    """
+
+    range_changed = QtCore.Signal()
+
+    def __init__(self, minimum, maximum, parent=None):
+        super().__init__(parent)
+        self.minimum = float(minimum)
+        self.maximum = float(maximum)
+        self.exponent = _display_exponent(max(abs(self.minimum), abs(self.maximum)))
+        self.scale = 10.0**self.exponent
+        lo = self.minimum / self.scale
+        hi = self.maximum / self.scale
+        span = hi - lo
+        if span > 0 and np.isfinite(span):
+            # Enough decimals to resolve a hundredth of the range.
+            decimals = int(min(max(3 - np.floor(np.log10(span)), 0), 15))
+        else:
+            decimals = 6
+        layout = QtWidgets.QHBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.setLayout(layout)
+        self.lo_box = QtWidgets.QDoubleSpinBox()
+        self.hi_box = QtWidgets.QDoubleSpinBox()
+        for box, val in ((self.lo_box, lo), (self.hi_box, hi)):
+            box.setDecimals(decimals)
+            box.setRange(lo, hi)
+            box.setSingleStep(span / 100)
+            if self.exponent:
+                box.setSuffix(f" e{self.exponent}")
+            box.setValue(val)
+            box.valueChanged.connect(lambda _=None: self.range_changed.emit())
+            layout.addWidget(box)
+
+    def value(self):
+        """
+        The selected range.
+
+        Returns:
+            tuple: (min, max), the limits of the data if a spin box is at its limit.
+        """
+        lo = self.lo_box.value() * self.scale
+        hi = self.hi_box.value() * self.scale
+        # The spin boxes round, the data limits are included exactly.
+        if self.lo_box.value() <= self.lo_box.minimum():
+            lo = self.minimum
+        if self.hi_box.value() >= self.hi_box.maximum():
+            hi = self.maximum
+        return lo, hi
+
+    def set_value(self, lo, hi):
+        """
+        Select a range.
+
+        Parameters:
+            lo (float): The lower limit.
+            hi (float): The upper limit.
+        """
+        self.lo_box.setValue(lo / self.scale)
+        self.hi_box.setValue(hi / self.scale)
+
+
+def _display_exponent(magnitude):
+    """
+    Power of ten (a multiple of 3) to show values of this magnitude with.
+
+    Parameters:
+        magnitude (float): The largest absolute value to show.
+
+    Returns:
+        int: 0 for values that are readable without scaling.
+    """
+    if not magnitude or not np.isfinite(magnitude):
+        return 0
+    exponent = int(np.floor(np.log10(magnitude)))
+    if -3 <= exponent < 6:
+        return 0
+    return 3 * (exponent // 3)
+
+
+def _file_stamp(file_path):
+    """
+    Modification time and size of a file, to detect changes since a session was saved.
+
+    Parameters:
+        file_path (str): Path of the file.
+
+    Returns:
+        list: [mtime in ns, size], None if the file does not exist.
+    """
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _selection_from_json(selection):
+    """
+    Turn an image selection read from a session back into the tuple of `_image_state`.
+
+    Parameters:
+        selection (list): The selection as stored by JSON.
+
+    Returns:
+        tuple: The selection, with range filters as tuples.
+    """
+    *values, filters = selection
+    filters = tuple(
+        (key, tuple(value) if isinstance(value, list) else value)
+        for key, value in filters
+    )
+    return (*values, filters)
+
+
+def _widget_value(widget):
+    """
+    The value of a settings widget, see `CAMELS_Viewer._session_widgets`.
+
+    Parameters:
+        widget (QWidget): A check box, checkable group box, spin box or combo box.
+
+    Returns:
+        bool or float or str: The value.
+    """
+    if isinstance(widget, QtWidgets.QComboBox):
+        return widget.currentText()
+    if isinstance(widget, QtWidgets.QAbstractSpinBox):
+        return widget.value()
+    return widget.isChecked()
+
+
+def _set_widget_value(widget, value):
+    """
+    Set the value of a settings widget, see `_widget_value`.
+
+    Parameters:
+        widget (QWidget): The widget.
+        value (bool or float or str): The value.
+    """
+    if isinstance(widget, QtWidgets.QComboBox):
+        widget.setCurrentText(value)
+    elif isinstance(widget, QtWidgets.QAbstractSpinBox):
+        widget.setValue(value)
+    else:
+        widget.setChecked(value)
+
+
+def _filter_choices(data, key, max_values):
+    """
+    The values or the range by which a 1D column can be filtered.
+
+    The statistics of a `LazyDataSet` are used if available, then the column
+    is not read.
+
+    Parameters:
+        data (LazyDataSet or dict): The data set.
+        key (str): Name of the column.
+        max_values (int): Numeric columns with more values are filtered by a range.
+
+    Returns:
+        np.ndarray or tuple or None: The sorted unique values, or (min, max)
+        for a range, None if the column has less than two values.
+    """
+    stats = getattr(data, "stats", {}).get(key)
+    if stats is not None:
+        if not stats["count"]:
+            return None
+        if stats["values"] is None:
+            return stats["min"], stats["max"]
+        values = stats["values"]
+    else:
+        values = _unique_values(data[key])
+        if len(values) > max_values and values.dtype.kind in "iuf":
+            return values[0], values[-1]
+    if len(values) < 2:
+        return None
+    return values
+
+
+def _unique_values(column):
+    """
+    The sorted unique values of a 1D column.
+
+    Parameters:
+        column (np.ndarray): The data.
+
+    Returns:
+        np.ndarray: The unique values.
+    """
+    column = np.asarray(column)
+    try:
+        return np.unique(column)
+    except TypeError:
+        # Objects of different types cannot be compared.
+        return np.array(sorted(set(column), key=str), dtype=object)
+
+
+def _column_shape(data, key):
+    """
+    Get the shape of a column, without reading it for lazily loaded data.
+
+    Parameters:
+        data (LazyDataSet or dict): The data set.
+        key (str): Name of the column.
+
+    Returns:
+        tuple: The shape of the column.
+    """
+    if isinstance(data, LazyDataSet):
+        return data.shape(key)
+    return np.shape(data[key])
+
+
+def _range_text(name, values):
+    """
+    Label text of the values of an image axis in the ROI.
+
+    Parameters:
+        name (str): Name of the axis.
+        values (np.ndarray): The values inside the ROI.
+    """
+    if len(values) == 1:
+        return f"{name} = {values[0]}"
+    return f"{name} = {values[0]} ... {values[-1]}"
+
+
+def _stack_curves(x, y, offset=0.0, n_groups=1):
+    """
+    Concatenate many curves into few arrays that can each be drawn by one item.
+
+    Parameters:
+        x (np.ndarray): The x values, (n_curves, n_points) or (n_points,) if
+            shared by all curves.
+        y (np.ndarray): The y values, (n_curves, n_points).
+        offset (float): Curve i is shifted by i * offset.
+        n_groups (int): Number of consecutive groups of curves to return,
+            e.g. to draw them in different colors.
+
+    Returns:
+        list: (x, y, connect) of every group, connect is False for the last
+        point of every curve, so that the curves are not joined.
+    """
+    y = np.asarray(y, dtype=float)
+    x = np.broadcast_to(np.asarray(x, dtype=float), y.shape)
+    if offset:
+        y = y + offset * np.arange(len(y))[:, None]
+    connect = np.ones(y.shape, dtype=bool)
+    connect[:, -1] = False
+    curves = []
+    for rows in np.array_split(np.arange(len(y)), min(n_groups, len(y))):
+        if len(rows):
+            part = slice(rows[0], rows[-1] + 1)
+            curves.append(
+                (x[part].ravel(), y[part].ravel(), connect[part].ravel())
+            )
+    return curves
+
+
 def ask_for_input_box(values):
     """
     Open a dialog for the user to select one option from a list.
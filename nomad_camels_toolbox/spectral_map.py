@@ -0,0 +1,189 @@
+"""
+Fitting of scans where every point stores a spectrum.
+
+The spectra are arranged on the same image grid as the `CAMELS_Viewer` uses
+for its integrated-intensity images, see `intensity_map.map_grid`.
+"""
+
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import lmfit
+import numpy as np
+
+try:
+    from .data_reader import read_camels_file
+    from .intensity_map import map_grid
+except ImportError:
+    # The viewer is also started from within this directory.
+    from data_reader import read_camels_file
+    from intensity_map import map_grid
+
+
+def fit_spectral_map(
+    data,
+    x_name,
+    y_name,
+    x_ax,
+    y_ax=None,
+    model="Gaussian",
+    filters=None,
+    workers=None,
+    entry_key: str = "",
+    data_set_key: str = "",
+):
+    """Fit a model to every spectrum of a map and return images of the parameters.
+
+    The map is split by rows (points with the same image X value), each row is
+    fitted in a separate process. Inside a row, each fit starts from the result
+    of the neighbouring pixel. If that fit does not converge, it is repeated
+    starting from the model's guess.
+
+    Parameters
+    ----------
+    data : str or dict or pandas.DataFrame
+        The data of the map or the path to a CAMELS file.
+    x_name : str
+        Name of the x values of the spectra (e.g. the wavelength).
+    y_name : str
+        Name of the spectra.
+    x_ax : str
+        Name of the 1D data used as image X axis.
+    y_ax : str, optional
+        Name of the 1D data used as image Y axis. If not provided, the map is a
+        line with a single Y value.
+    model : str or lmfit.Model, optional
+        The model to fit. Strings are either names of lmfit's built-in models
+        or an expression for `lmfit.models.ExpressionModel`. Default is "Gaussian".
+    filters : dict, optional
+        Only points whose values equal the given values, or lie in the
+        given (min, max) ranges, are used, as in the filters of the viewer.
+    workers : int, optional
+        Number of worker processes. If not provided, the number of CPUs is used.
+    entry_key : str, optional
+        The entry key, only used if `data` is a path.
+    data_set_key : str, optional
+        The data set to read, only used if `data` is a path.
+
+    Returns
+    -------
+    dict
+        "x_values", "y_values": the values of the image axes,
+        "params": a dictionary of (len(x_values), len(y_values)) images of the
+        best-fit values for every parameter of the model,
+        "stderr": the same for the standard errors of the parameters,
+        "redchi": the image of the reduced chi-square,
+        "success": a boolean image whether the fit converged.
+        Pixels without data or failed fits are NaN.
+    """
+    if isinstance(data, str):
+        data = read_camels_file(
+            data,
+            entry_key=entry_key,
+            data_set_key=data_set_key,
+            return_dataframe=False,
+        )
+    grid = map_grid(data, x_ax, y_ax, filters)
+    y_spec = np.asarray(data[y_name])[grid["rows"]]
+    x_spec = np.asarray(data[x_name])
+    if x_spec.ndim == 1:
+        # The same x values for all spectra.
+        x_spec = np.broadcast_to(x_spec, y_spec.shape)
+    else:
+        x_spec = x_spec[grid["rows"]]
+    shape = (len(grid["x_values"]), len(grid["y_values"]))
+    row_starts = np.flatnonzero(np.diff(grid["ix"], prepend=-1))
+    row_ends = np.append(row_starts[1:], len(grid["ix"]))
+
+    results = {"params": {}, "stderr": {}}
+    results["redchi"] = np.full(shape, np.nan)
+    results["success"] = np.zeros(shape, dtype=bool)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                _fit_map_row,
+                model,
+                np.asarray(x_spec[start:end], dtype=float),
+                np.asarray(y_spec[start:end], dtype=float),
+            )
+            for start, end in zip(row_starts, row_ends)
+        ]
+        for start, end, future in zip(row_starts, row_ends, futures):
+            try:
+                row_results = future.result()
+            except Exception as e:
+                warnings.warn(f"Could not fit the row starting at point {start}.\n{e}")
+                continue
+            ix = grid["ix"][start:end]
+            iy = grid["iy"][start:end]
+            for name in row_results["params"]:
+                for key in ("params", "stderr"):
+                    if name not in results[key]:
+                        results[key][name] = np.full(shape, np.nan)
+                    results[key][name][ix, iy] = row_results[key][name]
+            results["redchi"][ix, iy] = row_results["redchi"]
+            results["success"][ix, iy] = row_results["success"]
+    results["x_values"] = grid["x_values"]
+    results["y_values"] = grid["y_values"]
+    return results
+
+
+def _make_map_model(model):
+    if isinstance(model, lmfit.Model):
+        return model
+    if model in lmfit.models.lmfit_models:
+        return lmfit.models.lmfit_models[model]()
+    return lmfit.models.ExpressionModel(model)
+
+
+def _fit_map_row(model, x_spectra, y_spectra):
+    """Fit all spectra of one row of the map, each starting from its neighbour."""
+    model = _make_map_model(model)
+    n = len(y_spectra)
+    results = {
+        "params": {name: np.full(n, np.nan) for name in model.param_names},
+        "stderr": {name: np.full(n, np.nan) for name in model.param_names},
+        "redchi": np.full(n, np.nan),
+        "success": np.zeros(n, dtype=bool),
+    }
+    last_params = None
+    for i, (x, y) in enumerate(zip(x_spectra, y_spectra)):
+        valid = np.isfinite(x) & np.isfinite(y)
+        x = x[valid]
+        y = y[valid]
+        if len(x) < len(model.param_names):
+            continue
+        result = None
+        if last_params is not None:
+            result = _try_fit(model, y, x, last_params)
+        if result is None or not result.success:
+            result = _try_fit(model, y, x, _guess_params(model, y, x))
+        if result is None:
+            continue
+        if result.success:
+            last_params = result.params
+        for name, par in result.params.items():
+            if name not in results["params"]:
+                # derived parameters, e.g. fwhm and height of peak models
+                results["params"][name] = np.full(n, np.nan)
+                results["stderr"][name] = np.full(n, np.nan)
+            results["params"][name][i] = par.value
+            if par.stderr is not None:
+                results["stderr"][name][i] = par.stderr
+        results["redchi"][i] = result.redchi
+        results["success"][i] = result.success
+    return results
+
+
+def _guess_params(model, y, x):
+    try:
+        return model.guess(y, x=x)
+    except NotImplementedError:
+        return model.make_params()
+
+
+def _try_fit(model, y, x, params):
+    try:
+        return model.fit(y, params.copy(), x=x)
+    except Exception:
+        return None
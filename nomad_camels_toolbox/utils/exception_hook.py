@@ -1,73 +1,198 @@
-from traceback import format_tb, print_tb
-from PySide6.QtWidgets import QMessageBox, QTextEdit, QPushButton
+import logging
+import logging.handlers
+import os
+import sys
+import time
+from traceback import extract_tb, format_exception
 
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtWidgets import (
+    QApplication,
+    QHBoxLayout,
+    QPushButton,
+    QTextEdit,
+    QTreeWidget,
+    QTreeWidgetItem,
+    QVBoxLayout,
+    QWidget,
+)
 
-class ErrorMessage(QMessageBox):
-    """A popUp-box describing an Error.
+# Full tracebacks are written to this file, it is rotated at `log_max_bytes`.
+log_file = os.path.join(os.path.expanduser("~"), ".nomad_camels_toolbox", "errors.log")
+log_max_bytes = 1024**2
+log_backup_count = 3
+
+# The error panel is brought to the front at most once in this many seconds.
+min_show_interval = 2.0
+
+_logger = None
+_panel = None
+
+
+class ErrorPanel(QWidget):
+    """A non-modal window listing the exceptions that occurred.
+
+    Exceptions of the same type raised at the same location are shown in one
+    row with the number of repeats. The traceback of the selected row is
+    shown below the list.
 
     Parameters
     ----------
-    msg : str
-        the error message
-    info_text : str
-        A longer text, explaining the error (usually traceback)
     parent : QWidget
-        The parent widget of this Messagebox
+        The parent widget of the panel
     """
 
-    def __init__(self, exc_info, parent=None):
-        tb = format_tb(exc_info[2])
-        print_tb(exc_info[2])
-        msg = str(exc_info[0].__name__)
-        info_text = str(exc_info[1])
-        print(msg)
-        print(info_text)
-        super().__init__(parent)
-        self.setWindowTitle("ERROR")
-        self.setIcon(QMessageBox.Warning)
-        self.setStandardButtons(QMessageBox.Ok)
-        self.setText(msg)
-        if info_text:
-            self.setInformativeText(info_text)
-
-        self.more_info_button = QPushButton("more information")
-        self.more_info_button.clicked.connect(self.show_more_info)
-
+    def __init__(self, parent=None):
+        super().__init__(parent, Qt.Window)
+        self.setWindowTitle("ERRORS")
+        # The application still quits when the last other window is closed.
+        self.setAttribute(Qt.WA_QuitOnClose, False)
+        self.tree = QTreeWidget()
+        self.tree.setHeaderLabels(["count", "error", "message", "location"])
+        self.tree.setRootIsDecorated(False)
+        self.tree.currentItemChanged.connect(self._show_traceback)
         self.text_edit = QTextEdit()
         self.text_edit.setReadOnly(True)
-        self.text_edit.setVisible(False)
-        self.text_edit.setPlainText("".join(tb))
-
-        self.layout().addWidget(self.more_info_button, 3, 0, 1, 5)
-        self.layout().addWidget(self.text_edit, 2, 0, 1, 5)
-        self.layout().addWidget(self.button(QMessageBox.Ok), 4, 0, 1, 5)
-        self.showing_more_info = False
-        self.adjustSize()
-
-    def show_more_info(self):
-        if self.showing_more_info:
-            self.text_edit.setVisible(False)
-            self.more_info_button.setText("more information")
-            self.adjustSize()
-            self.showing_more_info = False
-        else:
-            self.text_edit.setVisible(True)
-            self.more_info_button.setText("hide additional information")
-            self.text_edit.setMinimumHeight(500)
-            self.text_edit.setMinimumWidth(800)
-            self.showing_more_info = True
-        self.adjustSize()
+        self.clear_button = QPushButton("clear")
+        self.clear_button.clicked.connect(self.clear)
+        self.close_button = QPushButton("close")
+        self.close_button.clicked.connect(self.hide)
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+        layout.addWidget(self.tree)
+        layout.addWidget(self.text_edit)
+        buttons = QHBoxLayout()
+        buttons.addStretch()
+        buttons.addWidget(self.clear_button)
+        buttons.addWidget(self.close_button)
+        layout.addLayout(buttons)
+        self.resize(800, 500)
+
+        self.entries = {}
+        self._last_shown = 0.0
+        # Shows the panel once `min_show_interval` passed since the last show.
+        self._show_timer = QTimer(self)
+        self._show_timer.setSingleShot(True)
+        self._show_timer.timeout.connect(self._show_now)
+
+    def add(self, exc_info):
+        """Add an exception to the list or count it if it is known.
+
+        The panel is shown for exceptions that are not in the list yet, but
+        at most once in `min_show_interval` seconds. A new exception arriving
+        earlier shows the panel when the interval has passed.
+
+        Parameters
+        ----------
+        exc_info : tuple(class, Exception, traceback)
+            The information for the exception.
+
+        Returns
+        -------
+        int
+            How often the exception occurred, 1 for a new one.
+        """
+        key = _error_key(exc_info)
+        if key in self.entries:
+            item = self.entries[key]
+            count = int(item.text(0)) + 1
+            item.setText(0, str(count))
+            item.setText(2, str(exc_info[1]))
+            return count
+        frames = extract_tb(exc_info[2])
+        location = f"{frames[-1].filename}:{frames[-1].lineno}" if frames else ""
+        item = QTreeWidgetItem(
+            ["1", exc_info[0].__name__, str(exc_info[1]), location]
+        )
+        item.setData(0, Qt.UserRole, "".join(format_exception(*exc_info)))
+        self.tree.addTopLevelItem(item)
+        self.entries[key] = item
+        if self.tree.currentItem() is None:
+            self.tree.setCurrentItem(item)
+        wait = self._last_shown + min_show_interval - time.monotonic()
+        if wait <= 0:
+            self._show_now()
+        elif not self._show_timer.isActive():
+            self._show_timer.start(int(wait * 1000) + 1)
+        return 1
+
+    def clear(self):
+        """Remove all exceptions from the list."""
+        self.tree.clear()
+        self.entries.clear()
+        self.text_edit.clear()
+
+    def _show_now(self):
+        self._show_timer.stop()
+        self._last_shown = time.monotonic()
+        self.show()
+        self.raise_()
+
+    def _show_traceback(self, item, previous=None):
+        if item is None:
+            return
+        self.text_edit.setPlainText(item.data(0, Qt.UserRole))
+
+
+def _error_key(exc_info):
+    """The type of the exception and the locations of its traceback."""
+    frames = extract_tb(exc_info[2])
+    return exc_info[0], tuple((f.filename, f.lineno, f.name) for f in frames)
+
+
+def _get_logger():
+    """The logger writing to the rotating `log_file`, created on first use."""
+    global _logger
+    if _logger is None:
+        _logger = logging.getLogger("nomad_camels_toolbox.errors")
+        _logger.propagate = False
+        try:
+            os.makedirs(os.path.dirname(log_file), exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                log_file,
+                maxBytes=log_max_bytes,
+                backupCount=log_backup_count,
+                encoding="utf-8",
+            )
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        except OSError:
+            handler = logging.NullHandler()
+        _logger.addHandler(handler)
+    return _logger
 
 
 def exception_hook(*exc_info):
     """Used to overwrite sys.excepthook, so that an exception does not
     terminate the program, but simply shows a Message with the exception.
-    If the Exception is a KeyboardInterrupt, it does nothing, so that the
-    interrupt may actually stop the program execution.
+    If the Exception is a KeyboardInterrupt, it is passed to the default
+    hook, so that the interrupt may actually stop the program execution.
+
+    The exceptions are collected in a non-modal `ErrorPanel`, repeats of an
+    exception are only counted. The full traceback of every new exception
+    is printed and written to the rotating `log_file`, repeats are logged
+    with a single line.
 
     Parameters
     ----------
     *exc_info : tuple(class, Exception, traceback)
         The information for the exception.
     """
-    ErrorMessage(exc_info).exec()
+    global _panel
+    if issubclass(exc_info[0], KeyboardInterrupt):
+        sys.__excepthook__(*exc_info)
+        return
+    if QApplication.instance() is None:
+        sys.__excepthook__(*exc_info)
+        _get_logger().error(exc_info[0].__name__, exc_info=exc_info)
+        return
+    if _panel is None:
+        _panel = ErrorPanel()
+    count = _panel.add(exc_info)
+    if count == 1:
+        sys.__excepthook__(*exc_info)
+        _get_logger().error(exc_info[0].__name__, exc_info=exc_info)
+    else:
+        _get_logger().error(
+            f"{exc_info[0].__name__}: {exc_info[1]} (repeated, {count} times)"
+        )
@@ -0,0 +1,54 @@
+"""Provides functions to derive file names for the exported data"""
+
+import os
+import re
+
+
+def safe_file_name(name, default="file"):
+    """
+    Replaces characters that are not allowed in file names.
+
+    Parameters
+    ----------
+    name : str
+        The name to use for the file.
+    default : str, optional
+        Used if nothing is left of the name.
+    """
+    return re.sub(r'[<>:"/\\|?*\s]+', "_", str(name)).strip("_") or default
+
+
+def unique_file_stems(paths, default="file"):
+    """
+    Names for the outputs of several files, derived from the file names.
+
+    Files with the same name, e.g. from different directories, get a suffix
+    "_2", "_3", ... so that their outputs do not overwrite each other.
+
+    Parameters
+    ----------
+    paths : list of str
+        The paths of the files.
+    default : str, optional
+        Used for files whose name leaves nothing, see `safe_file_name`.
+
+    Returns
+    -------
+    dict
+        The name for every path.
+    """
+    stems = {}
+    taken = set()
+    for path in paths:
+        if path in stems:
+            continue
+        base = safe_file_name(os.path.splitext(os.path.basename(path))[0], default)
+        stem = base
+        number = 1
+        # Compare case-insensitively, the file system might do so as well.
+        while stem.lower() in taken:
+            number += 1
+            stem = f"{base}_{number}"
+        taken.add(stem.lower())
+        stems[path] = stem
+    return stems
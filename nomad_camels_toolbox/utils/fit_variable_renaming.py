@@ -1,6 +1,8 @@
 """Provides a function to rename typical names for fit-variables to valid
 python-names"""
 
+from functools import lru_cache
+
 fit_variable_changer = {
     "+": "plus",
     "-": "minus",
@@ -18,17 +20,174 @@ fit_variable_changer = {
     " ": "_",
 }
 
+# NOMAD CAMELS applies the replacements one after another, "=" and "*" are
+# replaced before "==" and "**" can match. As no replacement contains any of
+# the symbols, a single pass over the characters gives the same names.
+_translation = str.maketrans(
+    {key: val for key, val in fit_variable_changer.items() if len(key) == 1}
+)
+
 
+@lru_cache(maxsize=4096)
 def replace_name(var_name):
     """
     Replaces mathematical symbols with text so that the variable name becomes a
     valid name.
 
+    The result is the same as applying the replacements of
+    `fit_variable_changer` in order, i.e. the names of the fits stored by
+    NOMAD CAMELS, "==" becomes "equalsequals" and "**" becomes "timestimes".
+    Recent results are cached.
+
     Parameters
     ----------
     var_name : str
         The variable that should be renamed.
     """
-    for key in fit_variable_changer:
-        var_name = var_name.replace(key, fit_variable_changer[key])
-    return var_name
+    return var_name.translate(_translation)
+
+
+def stored_fit_name(func, y, x, stream):
+    """
+    The name under which NOMAD CAMELS stores a fit.
+
+    Parameters
+    ----------
+    func : str
+        The name of the predefined model or the custom expression.
+    y : str
+        The fitted y data.
+    x : str
+        The x data of the fit.
+    stream : str
+        The data set of the fit.
+    """
+    return replace_name("_".join((func, y, "v", x, stream)))
+
+
+class FitIndex:
+    """
+    Index of the fits stored in a CAMELS file.
+
+    Every stored fit is keyed by (function, y, x, stream). The stored names
+    are renamed by `replace_name` and cannot be translated back exactly, so
+    the keys are first taken apart from the stored names, with the renamed
+    parts. Keys registered with `add`, e.g. from the plot definitions of the
+    protocol, replace them with the original names.
+
+    Parameters
+    ----------
+    fits : dict
+        The stored fits of every stream, {stream: {fit name: parameters}},
+        see `data_reader.read_fit_index`.
+    """
+
+    def __init__(self, fits):
+        self.fits = fits
+        self._names = {}
+        self._keys = {}
+        for stream, stream_fits in fits.items():
+            for name in stream_fits:
+                key = _split_fit_name(name, stream)
+                self._names[key] = (stream, name)
+                self._keys[(stream, name)] = key
+
+    def add(self, func, y, x, stream):
+        """
+        Register the original names of a fit.
+
+        Parameters
+        ----------
+        func, y, x, stream : str
+            See `stored_fit_name`.
+
+        Returns
+        -------
+        str or None
+            The name of the stored fit, None if it is not stored.
+        """
+        key = (func, y, x, stream)
+        name = stored_fit_name(*key)
+        if name not in self.fits.get(stream, {}):
+            return None
+        old_key = self._keys.get((stream, name))
+        if old_key is not None and old_key != key:
+            del self._names[old_key]
+        self._names[key] = (stream, name)
+        self._keys[(stream, name)] = key
+        return name
+
+    def get(self, func, y, x, stream):
+        """
+        The name of a stored fit.
+
+        Parameters
+        ----------
+        func, y, x, stream : str
+            See `stored_fit_name`.
+
+        Returns
+        -------
+        str or None
+            The name of the stored fit, None if it is not stored.
+        """
+        found = self._names.get((func, y, x, stream))
+        if found is not None:
+            return found[1]
+        return self.add(func, y, x, stream)
+
+    def key(self, stream, name):
+        """
+        The (function, y, x, stream) of a stored fit.
+
+        Parameters
+        ----------
+        stream : str
+            The data set of the fit.
+        name : str
+            The name of the stored fit.
+
+        Returns
+        -------
+        tuple or None
+            The key of the fit, None if there is no such fit.
+        """
+        return self._keys.get((stream, name))
+
+    def parameters(self, func, y, x, stream):
+        """
+        The stored parameters of a fit.
+
+        Parameters
+        ----------
+        func, y, x, stream : str
+            See `stored_fit_name`.
+
+        Returns
+        -------
+        dict or None
+            The stored values of the fit, None if it is not stored.
+        """
+        name = self.get(func, y, x, stream)
+        if name is None:
+            return None
+        return self.fits[stream][name]
+
+    def __contains__(self, key):
+        return self.get(*key) is not None
+
+    def __iter__(self):
+        return iter(list(self._names))
+
+    def __len__(self):
+        return len(self._names)
+
+
+def _split_fit_name(name, stream):
+    """(function, y, x, stream) as far as it can be read from a stored name."""
+    suffix = "_" + replace_name(stream)
+    if name.endswith(suffix):
+        name = name[: -len(suffix)]
+    func, _, rest = name.partition("_")
+    y, _, x = rest.partition("_v_")
+    return func, y, x, stream